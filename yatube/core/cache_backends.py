@@ -0,0 +1,261 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_stats SET size = size - OLD.size + NEW.size;
+END;
+'''
+
+# Файлы, схема которых уже проверена в этом процессе: (pid, путь).
+_prepared = set()
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+    Записи вытесняются по давности последнего чтения (LRU), когда их
+    суммарный размер превышает OPTIONS['MAX_SIZE'] байт или их число
+    превышает MAX_ENTRIES. Время чтения обновляется не чаще раза
+    в ACCESS_RESOLUTION секунд, чтобы чтения почти не требовали записи.
+    incr/decr выполняются в транзакции BEGIN IMMEDIATE и атомарны
+    между процессами.
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        params = {**params, 'OPTIONS': {
+            name: value for name, value in options.items()
+            if name not in ('MAX_SIZE', 'ACCESS_RESOLUTION')
+        }}
+        super().__init__(params)
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение нельзя переносить в дочерний процесс после fork.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.db = None
+            self._local.pid = os.getpid()
+        db = self._local.db
+        if db is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA synchronous=NORMAL')
+            # Режим WAL сохраняется в самом файле, а схема создаётся
+            # с записью в cache_stats, поэтому это делается раз на процесс.
+            if (os.getpid(), self._path) not in _prepared:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(SCHEMA)
+                _prepared.add((os.getpid(), self._path))
+            self._local.db = db
+        return db
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _read(self, db, key, now):
+        row = db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now)
+            )
+            return None
+        if now - accessed > self._access_resolution:
+            db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return value
+
+    def _write(self, db, key, value, timeout, now):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        db.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+            (key, data, self._expires(timeout), now, len(data))
+        )
+
+    def _cull(self, db, now):
+        entries, size = db.execute(
+            'SELECT entries, size FROM cache_stats').fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        while True:
+            entries, size = db.execute(
+                'SELECT entries, size FROM cache_stats').fetchone()
+            if entries <= self._max_entries and size <= self._max_size:
+                return
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),)
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        # Чтение идёт вне BEGIN IMMEDIATE: в режиме WAL читатели
+        # не ждут писателей, а обновление accessed идемпотентно.
+        value = self._read(self._db, key, time.time())
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._db.execute(
+            'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({", ".join("?" * len(keys))})',
+            tuple(keys)
+        ).fetchall()
+        result, stale = {}, []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            result[keys[key]] = pickle.loads(value)
+            if now - accessed > self._access_resolution:
+                stale.append((now, key))
+        if stale:
+            with self._transaction() as db:
+                db.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?', stale)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as db:
+            self._write(db, key, value, timeout, now)
+            self._cull(db, now)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._transaction() as db:
+            for key, value in data.items():
+                self._write(db, self._key(key, version), value, timeout, now)
+            self._cull(db, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as db:
+            if self._read(db, key, now) is not None:
+                return False
+            self._write(db, key, value, timeout, now)
+            self._cull(db, now)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as db:
+            if self._read(db, key, now) is None:
+                return False
+            db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?',
+                (self._expires(timeout), key)
+            )
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as db:
+            value = self._read(db, key, now)
+            if value is None:
+                raise ValueError(f"Key '{key}' not found")
+            new_value = pickle.loads(value) + delta
+            data = pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (data, len(data), key)
+            )
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._read(self._db, key, time.time()) is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        with self._transaction() as db:
+            db.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                ((self._key(key, version),) for key in keys)
+            )
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        """
+        Django вызывает close() после каждого запроса. Соединение потока
+        остаётся открытым: новое стоило бы в десятки раз дороже чтения.
+        """
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, откат при исключении."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
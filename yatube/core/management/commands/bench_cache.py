@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+VALUE = 'x' * 2048
+
+
+def make_cache(name, location):
+    params = {'OPTIONS': {'MAX_ENTRIES': 1_000_000}}
+    return import_string(BACKENDS[name])(location, params)
+
+
+def incr_worker(name, location, ops):
+    cache = make_cache(name, location)
+    for _ in range(ops):
+        cache.incr('counter')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость set/get/incr для LocMemCache, '
+            'FileBasedCache и SQLiteCache и проверяет, что incr '
+            'из нескольких процессов не теряет обновлений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=2000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        ops, processes = options['ops'], options['processes']
+        self.stdout.write(
+            f'{"backend":<10} {"set/s":>9} {"get/s":>9} {"miss/s":>9} '
+            f'{"incr/s":>9} {"incr x" + str(processes):>12}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name in BACKENDS:
+                location = os.path.join(directory, name)
+                if name == 'sqlite':
+                    location += '.sqlite3'
+                self.stdout.write(self.bench(name, location, ops, processes))
+
+    def bench(self, name, location, ops, processes):
+        cache = make_cache(name, location)
+        keys = [f'key-{i}' for i in range(ops)]
+        rates = [
+            self.rate(ops, lambda: [cache.set(key, VALUE) for key in keys]),
+            self.rate(ops, lambda: [cache.get(key) for key in keys]),
+            self.rate(ops, lambda: [cache.get(f'{key}-miss') for key in keys]),
+        ]
+        cache.set('counter', 0, None)
+        rates.append(
+            self.rate(ops, lambda: [cache.incr('counter') for _ in keys]))
+        line = f'{name:<10}' + ''.join(f' {rate:>9.0f}' for rate in rates)
+        if name == 'locmem':
+            # У каждого процесса своя копия: общий счётчик невозможен.
+            return f'{line} {"—":>12}'
+        cache.set('counter', 0, None)
+        workers = [
+            multiprocessing.Process(
+                target=incr_worker, args=(name, location, ops))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        counted = make_cache(name, location).get('counter')
+        return f'{line} {f"{counted}/{ops * processes}":>12}'
+
+    @staticmethod
+    def rate(ops, func):
+        start = time.perf_counter()
+        func()
+        return ops / (time.perf_counter() - start)
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+INCR_PROCESSES = 4
+INCR_OPS = 200
+
+
+def make_cache(location, **options):
+    return SQLiteCache(location, {'OPTIONS': options})
+
+
+def incr_worker(location):
+    cache = make_cache(location)
+    for _ in range(INCR_OPS):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = make_cache(self.location)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """set/get/add/delete/get_many ведут себя как у других бэкендов."""
+        cache = self.cache
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+        cache.set('key', {'value': [1, 2]})
+        self.assertEqual(cache.get('key'), {'value': [1, 2]})
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertTrue(cache.add('new', 'value'))
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 2})
+        cache.delete('a')
+        cache.delete_many(['b', 'new'])
+        self.assertFalse(cache.has_key('a'))
+        self.assertEqual(cache.get_many(['a', 'b', 'new']), {})
+        cache.clear()
+        self.assertIsNone(cache.get('key'))
+
+    def test_expiration(self):
+        """Просроченные записи не отдаются, touch продлевает запись."""
+        self.cache.set('short', 'value', 0.05)
+        self.cache.set('touched', 'value', 0.05)
+        self.assertTrue(self.cache.touch('touched', None))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('touched'), 'value')
+        self.assertTrue(self.cache.add('short', 'again'))
+
+    def test_shared_between_instances(self):
+        """Запись одного экземпляра видна другому, как другому процессу."""
+        self.cache.set('key', 'value')
+        other = make_cache(self.location)
+        self.assertEqual(other.get('key'), 'value')
+        other.close()
+
+    def test_connection_kept_after_close(self):
+        """close() после запроса не закрывает соединение потока."""
+        self.cache.set('key', 'value')
+        db = self.cache._db
+        self.cache.close()
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertIs(self.cache._db, db)
+
+    def test_incr_decr(self):
+        self.cache.set('counter', 10)
+        self.assertEqual(self.cache.incr('counter'), 11)
+        self.assertEqual(self.cache.decr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        """Параллельные incr из разных процессов не теряют обновлений."""
+        self.cache.set('counter', 0, None)
+        workers = [
+            multiprocessing.Process(target=incr_worker, args=(self.location,))
+            for _ in range(INCR_PROCESSES)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(
+            self.cache.get('counter'), INCR_PROCESSES * INCR_OPS)
+
+    def test_lru_eviction_under_size_budget(self):
+        """
+        Сверх бюджета размера вытесняются записи, которые дольше всего
+        не читали.
+        """
+        cache = make_cache(
+            self.location, MAX_SIZE=10_000, ACCESS_RESOLUTION=0)
+        value = 'x' * 1000
+        cache.set('recent', value)
+        for i in range(20):
+            cache.set(f'key-{i}', value)
+            cache.get('recent')
+        self.assertEqual(cache.get('recent'), value)
+        self.assertIsNone(cache.get('key-0'))
+        size = cache._db.execute('SELECT size FROM cache_stats').fetchone()[0]
+        self.assertLessEqual(size, 10_000)
+        cache.close()
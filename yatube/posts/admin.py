@@ -1,11 +1,85 @@
+from django import forms
 from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Q
 
+from .lookups import users
 from .models import Comment, Follow, Group, Post
+from .utils import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Список без COUNT(*) по всей таблице. Запрос вида @username ищет
+    записи пользователя по индексам: пользователь берётся по уникальному
+    username, записи — по внешним ключам username_search_fields.
+    Остальные запросы идут в обычный поиск по search_fields.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    username_search_fields = ()
+    username_search_prefix = '@'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if (not self.username_search_fields
+                or not term.startswith(self.username_search_prefix)):
+            return super().get_search_results(
+                request, queryset, search_term)
+        user = users.get(term[len(self.username_search_prefix):])
+        if user is None:
+            return queryset.none(), False
+        condition = Q()
+        for field in self.username_search_fields:
+            condition |= Q(**{field: user.pk})
+        return queryset.filter(condition), False
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Автодополнение, которому можно заранее передать выбранные объекты
+    (preloaded): подпись выбранного значения берётся из них, без запроса
+    к базе на каждую строку списка.
+    """
+    preloaded = ()
+
+    def optgroups(self, name, value, attr=None):
+        objects = {str(obj.pk): obj for obj in self.preloaded}
+        selected = {
+            str(v) for v in value
+            if str(v) not in self.choices.field.empty_values
+        }
+        if not selected or not selected <= objects.keys():
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for key in selected:
+            options.append(self.create_option(
+                name, objects[key].pk,
+                self.choices.field.label_from_instance(objects[key]),
+                selected, len(options)))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    """
+    Строка списка постов: группа поста уже загружена через
+    list_select_related и передаётся виджету группы.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        # Виджет связи обёрнут в RelatedFieldWidgetWrapper.
+        widget = getattr(widget, 'widget', widget)
+        if self.instance.group_id is not None:
+            widget.preloaded = (self.instance.group,)
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -14,44 +88,62 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
+    username_search_fields = ('author',)
     list_filter = ('pub_date',)
     empty_value_display = settings.EMPTY_VALUE
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        return super().get_changelist_form(
+            request, form=PostChangeListForm, **kwargs)
+
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'title',
         'slug',
         'description',
     )
-    search_fields = ('title',)
-    list_filter = ('slug',)
+    search_fields = ('title', '=slug')
     empty_value_display = settings.EMPTY_VALUE
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'post',
         'author',
         'text',
     )
-    search_fields = ('author',)
+    list_select_related = ('post', 'author')
+    autocomplete_fields = ('post', 'author')
+    search_fields = ('text',)
+    username_search_fields = ('author',)
     list_filter = ('created',)
     empty_value_display = settings.EMPTY_VALUE
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'user',
         'author',
     )
-    search_fields = ('user', 'author')
-    list_filter = ('user',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    username_search_fields = ('user', 'author')
     empty_value_display = settings.EMPTY_VALUE
@@ -0,0 +1,175 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .caching import cache_anonymous_page, generation_modified
+from .lookups import groups, users
+from .models import Comment, Post
+from .timeline import timeline_posts
+from .utils import CursorPaginator
+from .views import check_post_exists
+
+# Поля постов и комментариев, которые читаются из базы: values() вместо
+# экземпляров моделей, связанные таблицы — одним JOIN.
+POST_FIELDS = (
+    'pk', 'text', 'pub_date', 'updated', 'image', 'comments_count',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug', 'group__title',
+)
+COMMENT_FIELDS = (
+    'pk', 'text', 'created',
+    'author__username', 'author__first_name', 'author__last_name',
+)
+
+
+def author_json(row):
+    full_name = f'{row["author__first_name"]} {row["author__last_name"]}'
+    return {
+        'username': row['author__username'],
+        'full_name': full_name.strip(),
+    }
+
+
+def post_json(row):
+    group = None
+    if row['group__slug'] is not None:
+        group = {'slug': row['group__slug'], 'title': row['group__title']}
+    return {
+        'id': row['pk'],
+        'url': reverse('posts:post_detail', args=[row['pk']]),
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'updated': row['updated'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'comments_count': row['comments_count'],
+        'author': author_json(row),
+        'group': group,
+    }
+
+
+def comment_json(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'created': row['created'],
+        'author': author_json(row),
+    }
+
+
+def cursor_page(request, queryset, fields, key, per_page, to_json,
+                tiebreak='pk'):
+    """
+    Страница по курсору из ?cursor=: {'results', 'next', 'previous'},
+    где next и previous — курсоры соседних страниц или None.
+    """
+    if key not in fields:
+        fields = (*fields, key)
+    paginator = CursorPaginator(
+        queryset.values(*fields), per_page, key, tiebreak=tiebreak)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except ValueError:
+        page = paginator.page()
+    return {
+        'results': [to_json(row) for row in page],
+        'next': page.next_cursor and str(page.next_cursor),
+        'previous': page.previous_cursor and str(page.previous_cursor),
+    }
+
+
+def json_response(request, data, status=200):
+    """
+    JSON с ETag по содержимому. Повторный запрос с тем же
+    If-None-Match получает 304 без тела.
+    """
+    response = JsonResponse(
+        data, status=status, encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False})
+    if status != 200:
+        return response
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response['ETag'] = etag
+    patch_cache_control(
+        response, no_cache=True, private=request.user.is_authenticated)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def posts_page(request, queryset, key='pub_date', tiebreak='pk'):
+    return cursor_page(request, queryset, POST_FIELDS, key,
+                       settings.POSTS_TO_OUTPUT, post_json, tiebreak)
+
+
+@cache_anonymous_page(generation_modified)
+def index(request):
+    return json_response(request, posts_page(request, Post.objects.all()))
+
+
+@cache_anonymous_page(generation_modified)
+def group_posts(request, slug):
+    group = groups.get_or_404(slug)
+    data = {
+        'group': {
+            'slug': group.slug,
+            'title': group.title,
+            'description': group.description,
+        },
+        **posts_page(request, Post.objects.filter(group_id=group.pk)),
+    }
+    return json_response(request, data)
+
+
+@cache_anonymous_page(generation_modified)
+def profile(request, username):
+    author = users.get_or_404(username)
+    data = {
+        'author': {
+            'username': author.username,
+            'full_name': author.get_full_name(),
+        },
+        **posts_page(request, Post.objects.filter(author_id=author.pk)),
+    }
+    return json_response(request, data)
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return json_response(
+            request, {'detail': 'Нужно войти на сайт.'}, status=403)
+    if settings.FOLLOW_FEED_MATERIALIZED:
+        data = posts_page(
+            request, timeline_posts(request.user), key='feed_date',
+            tiebreak='feed_post')
+    else:
+        data = posts_page(request, Post.objects.filter(
+            author__following__user=request.user))
+    return json_response(request, data)
+
+
+def comments_page(request, post_id):
+    return cursor_page(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        'created', settings.COMMENTS_TO_OUTPUT, comment_json)
+
+
+@cache_anonymous_page(generation_modified)
+def post_detail(request, post_id):
+    row = get_object_or_404(
+        Post.objects.filter(pk=post_id).values(*POST_FIELDS))
+    data = {
+        'post': post_json(row),
+        'comments': comments_page(request, post_id),
+    }
+    return json_response(request, data)
+
+
+def post_comments(request, post_id):
+    data = comments_page(request, post_id)
+    check_post_exists(post_id, data['results'])
+    return json_response(request, data)
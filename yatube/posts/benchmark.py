@@ -0,0 +1,195 @@
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from copy import deepcopy
+from importlib import import_module
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .caching import bump_generation
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .search import WORD
+
+URL_MODULES = ('posts.urls', 'users.urls')
+ROLES = ('anonymous', 'user')
+
+
+def routes():
+    """Имена маршрутов вида posts:index и их шаблоны из URL_MODULES."""
+    for module_name in URL_MODULES:
+        module = import_module(module_name)
+        for pattern in module.urlpatterns:
+            yield f'{module.app_name}:{pattern.name}', pattern
+
+
+def route_arguments():
+    """
+    Самые тяжёлые значения параметров маршрутов на текущих данных:
+    самая большая группа, автор с наибольшим числом подписчиков, пост
+    с наибольшим числом комментариев.
+    """
+    group = Group.objects.annotate(
+        count=Count('posts')).order_by('-count').first()
+    author = UserStats.objects.select_related('user').order_by(
+        '-followers_count').first()
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    if group is None or author is None or post is None:
+        return None
+    return {
+        'slug': group.slug,
+        'username': author.user.username,
+        'post_id': post.pk,
+    }
+
+
+def search_word():
+    """Длинное слово из последнего поста: у него много совпадений."""
+    post = Post.objects.order_by('-pk').first()
+    words = WORD.findall(post.text) if post else []
+    return max(words, key=len, default='пост')
+
+
+def reader():
+    """Пользователь с наибольшим числом подписок — для ленты подписок."""
+    stats = UserStats.objects.select_related('user').order_by(
+        '-following_count').first()
+    return stats.user if stats else None
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'), cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_meta():
+    return {
+        'commit': git_commit(),
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'counts': {
+            model._meta.model_name: model.objects.count()
+            for model in (User, Group, Post, Comment, Follow)
+        },
+    }
+
+
+class RouteBenchmark:
+    """
+    Замер каждого маршрута для анонима и вошедшего пользователя: число
+    запросов к базе, время ответа (медиана, минимум, максимум по repeat
+    запросам) и пик памяти по tracemalloc. Каждый запрос выполняется
+    в транзакции, которая откатывается, так что подписки, комментарии
+    и выход из аккаунта не меняют данные между замерами.
+    """
+
+    def __init__(self, repeat=5, cold=False):
+        self.repeat = repeat
+        self.cold = cold
+        self.arguments = route_arguments()
+        self.query = {'posts:search': {'q': search_word()}}
+        self.user = reader()
+        self.cookies = {}
+
+    def run(self):
+        if self.arguments is None or self.user is None:
+            raise ValueError('Нужны группа, пост и пользователи.')
+        return [
+            self.measure(name, pattern, role)
+            for name, pattern in routes() for role in ROLES
+        ]
+
+    def client(self, role):
+        """
+        Новый клиент с cookies роли: выход из аккаунта на одном замере
+        не должен превращать следующие в анонимные.
+        """
+        if role not in self.cookies:
+            client = Client()
+            if role == 'user':
+                client.force_login(self.user)
+            self.cookies[role] = client.cookies
+        client = Client()
+        client.cookies = deepcopy(self.cookies[role])
+        return client
+
+    def request(self, client, url, query):
+        if self.cold:
+            bump_generation()
+        with transaction.atomic():
+            response = client.get(url, query)
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, name, pattern, role):
+        url = reverse(name, kwargs={
+            key: self.arguments[key] for key in pattern.pattern.converters
+        })
+        query = self.query.get(name, {})
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # Первый запрос прогревает кэши. Запросы к базе считаются обёрткой:
+        # журнал соединения очищается в начале каждого запроса к сайту.
+        self.request(self.client(role), url, query)
+        with connection.execute_wrapper(count_query):
+            response = self.request(self.client(role), url, query)
+        timings = []
+        for _ in range(self.repeat):
+            client = self.client(role)
+            start = time.perf_counter()
+            self.request(client, url, query)
+            timings.append((time.perf_counter() - start) * 1000)
+        client = self.client(role)
+        tracemalloc.start()
+        try:
+            self.request(client, url, query)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'route': name,
+            'role': role,
+            'url': url,
+            'status': response.status_code,
+            'queries': len(queries),
+            'ms': {
+                'median': round(statistics.median(timings), 3),
+                'min': round(min(timings), 3),
+                'max': round(max(timings), 3),
+            } if timings else None,
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+
+def compare(results, previous):
+    """
+    Строки (маршрут, роль, было запросов, стало, было мс, стало мс)
+    для маршрутов, замеренных в обоих прогонах.
+    """
+    before = {(row['route'], row['role']): row for row in previous}
+    for row in results:
+        old = before.get((row['route'], row['role']))
+        if old is None:
+            continue
+        yield (
+            row['route'], row['role'], old['queries'], row['queries'],
+            (old['ms'] or {}).get('median'), (row['ms'] or {}).get('median'),
+        )
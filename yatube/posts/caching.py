@@ -0,0 +1,117 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+GENERATION_KEY = 'posts:generation'
+GENERATION_TIME_KEY = 'posts:generation_time'
+
+
+def get_generation():
+    """
+    Текущее поколение контента. Если ключ вытеснен из кэша, поколение
+    начинается заново с отметки времени и не совпадает ни с одним
+    из прежних значений.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_TIME_KEY, time.time(), None)
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    """Делает устаревшими все закэшированные списки постов."""
+    # Время записывается раньше поколения: страница, собранная между
+    # ними, попадёт в кэш под старым поколением и не будет использована.
+    cache.set(GENERATION_TIME_KEY, time.time(), None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def generation_modified(request, *args, **kwargs):
+    """
+    Время смены поколения — Last-Modified для списков постов. Оно
+    меняется при любой правке, удалении или переносе поста, в отличие
+    от наибольшего pub_date. Если время вытеснено из кэша, заголовка
+    нет и остаётся проверка по ETag.
+    """
+    get_generation()
+    modified = cache.get(GENERATION_TIME_KEY)
+    if modified is None:
+        return None
+    return datetime.fromtimestamp(modified, timezone.utc)
+
+
+def listing_cache(request, scope):
+    """
+    Контекст для {% cache %} списка постов: ключ учитывает область
+    (лента, группа, автор), страницу или курсор и поколение контента.
+    """
+    return {
+        'cache_timeout': settings.LISTING_CACHE_TIMEOUT,
+        'cache_key': ':'.join((
+            scope,
+            request.GET.get('page', ''),
+            request.GET.get('cursor', ''),
+            str(get_generation()),
+        )),
+    }
+
+
+def cache_anonymous_page(last_modified):
+    """
+    Кэширует целиком ответы на GET-запросы анонимных пользователей.
+    Ключ включает адрес страницы и поколение контента, поэтому после
+    любого изменения постов страница строится заново. Ответ получает
+    ETag и Last-Modified (last_modified(request, *args, **kwargs) должна
+    вернуть время последнего изменения или None), повторный запрос
+    с If-None-Match или If-Modified-Since получает 304 без рендеринга.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            key = f'page:{get_generation()}:{request.get_full_path()}'
+            entry = cache.get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                modified = last_modified(request, *args, **kwargs)
+                entry = {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'etag': quote_etag(
+                        hashlib.md5(response.content).hexdigest()),
+                    'last_modified': modified and int(modified.timestamp()),
+                }
+                cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+            else:
+                response = HttpResponse(
+                    entry['content'], content_type=entry['content_type'])
+            response['ETag'] = entry['etag']
+            if entry['last_modified'] is not None:
+                response['Last-Modified'] = http_date(entry['last_modified'])
+            elif response.has_header('Last-Modified'):
+                del response['Last-Modified']
+            patch_cache_control(response, no_cache=True)
+            return get_conditional_response(
+                request,
+                etag=entry['etag'],
+                last_modified=entry['last_modified'],
+                response=response,
+            )
+        return wrapper
+    return decorator
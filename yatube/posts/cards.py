@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.urls import reverse
+from django.utils.formats import date_format
+from django.utils.html import escape
+from django.utils.timezone import template_localtime
+
+from .thumbnails import post_pictures
+
+CARD = '''<article>
+  <ul>
+    <li>Автор: {author}
+      <a href="{profile_url}">все посты пользователя</a></li>
+    <li>Дата публикации: {pub_date}</li>
+  </ul>
+  {image}
+  <p>{text}</p>
+  <a href="{detail_url}">подробная информация </a>{group}
+</article>'''
+IMAGE = '<img class="card-img my-2" src="{src}"{srcset}>'
+SOURCE = '<source type="image/{type}"{srcset}>'
+SRCSET = ' srcset="{srcset}" sizes="{sizes}"'
+GROUP = '''
+  <br>
+  <a href="{url}">все записи группы</a>'''
+
+
+def picture_html(picture):
+    """
+    Разметка картинки поста. Для готовых миниатюр это <picture>:
+    все форматы, кроме последнего, идут в <source>, последний —
+    в srcset самого <img>.
+    """
+    if not picture.srcsets:
+        return IMAGE.format(src=escape(picture.src), srcset='')
+    srcsets = [
+        (image_format, SRCSET.format(
+            srcset=escape(srcset), sizes=escape(settings.POST_IMAGE_SIZES)))
+        for image_format, srcset in picture.srcsets
+    ]
+    sources = ''.join(
+        SOURCE.format(type=image_format.lower(), srcset=srcset)
+        for image_format, srcset in srcsets[:-1]
+    )
+    image = IMAGE.format(src=escape(picture.src), srcset=srcsets[-1][1])
+    return f'<picture>{sources}{image}</picture>'
+
+
+def card_key(post):
+    """
+    Ключ карточки: меняется при изменении самого поста, имени автора
+    или адреса группы — всего, что выводится в карточке.
+    """
+    author = post.author
+    return make_template_fragment_key('post_card', [
+        post.pk,
+        post.updated.isoformat(),
+        author.username,
+        author.get_full_name(),
+        post.group.slug if post.group else '',
+    ])
+
+
+class CardRenderer:
+    """
+    Рендерит карточки постов без шаблонизатора. Адреса профилей и групп
+    и имена авторов вычисляются один раз на автора и группу.
+    """
+
+    def __init__(self):
+        self._authors = {}
+        self._groups = {}
+
+    def _author(self, author):
+        if author.pk not in self._authors:
+            self._authors[author.pk] = (
+                escape(author.get_full_name() or author.username),
+                reverse('posts:profile', args=[author.username]),
+            )
+        return self._authors[author.pk]
+
+    def _group(self, group):
+        if group is None:
+            return ''
+        if group.pk not in self._groups:
+            self._groups[group.pk] = GROUP.format(
+                url=reverse('posts:group_list', args=[group.slug]))
+        return self._groups[group.pk]
+
+    def render(self, post, picture=None):
+        author, profile_url = self._author(post.author)
+        return CARD.format(
+            author=author,
+            profile_url=profile_url,
+            pub_date=date_format(template_localtime(post.pub_date), 'd E Y'),
+            image=picture_html(picture) if picture else '',
+            text=escape(post.text),
+            detail_url=reverse('posts:post_detail', args=[post.pk]),
+            group=self._group(post.group),
+        )
+
+    def render_many(self, posts):
+        """
+        {pk: (html, готова ли карточка окончательно)}. Миниатюры всех
+        постов проверяются одним пакетом; пока миниатюры нет, в карточке
+        показывается оригинал.
+        """
+        pictures = post_pictures(posts, 'card')
+        result = {}
+        for post in posts:
+            picture = pictures.get(post.pk)
+            ready = picture is None or picture.ready
+            result[post.pk] = self.render(post, picture), ready
+        return result
+
+
+def render_post_cards(posts):
+    """
+    Список HTML карточек постов страницы. Готовые карточки читаются из кэша
+    одним get_many, недостающие рендерятся за один проход и сохраняются
+    одним set_many. Карточки с оригиналом вместо ещё не готовой миниатюры
+    не кэшируются.
+    """
+    posts = list(posts)
+    keys = {post.pk: card_key(post) for post in posts}
+    cards = cache.get_many(keys.values())
+    missing = [post for post in posts if keys[post.pk] not in cards]
+    if missing:
+        fresh = {}
+        for pk, (html, ready) in CardRenderer().render_many(missing).items():
+            cards[keys[pk]] = html
+            if ready:
+                fresh[keys[pk]] = html
+        cache.set_many(fresh, settings.POST_CARD_CACHE_TIMEOUT)
+    return [cards[keys[post.pk]] for post in posts]
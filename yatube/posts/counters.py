@@ -0,0 +1,90 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _bump(queryset, **deltas):
+    # Greatest не даёт счётчику уйти в минус, если он уже разошёлся
+    # с данными (например, после bulk_create).
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def bump_user(user_id, **deltas):
+    """
+    Сдвигает счётчики пользователя. Строка счётчиков создаётся только
+    при увеличении: при каскадном удалении пользователя её уже нет.
+    """
+    if _bump(UserStats.objects.filter(user_id=user_id), **deltas):
+        return
+    if all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        _bump(UserStats.objects.filter(user_id=user_id), **deltas)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def group_posts_count(group_id):
+    """
+    Число постов группы. Читается из базы, а не из кэша групп в памяти
+    процесса: другие процессы узнали бы о новом посте с опозданием.
+    """
+    return Group.objects.filter(pk=group_id).values_list(
+        'posts_count', flat=True).first() or 0
+
+
+def bump_post(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def total_posts():
+    """
+    Число всех постов по счётчикам авторов: строк счётчиков намного
+    меньше, чем постов, и COUNT(*) по постам не нужен.
+    """
+    return UserStats.objects.aggregate(
+        total=Sum('posts_count'))['total'] or 0
+
+
+def get_stats(user):
+    """Счётчики пользователя; создаёт пустые, если их ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats.objects.get_or_create(user=user)[0]
+
+
+def _count(model, field, outer='pk'):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef(outer)}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def recount_all():
+    """Пересчитывает все счётчики по данным таблиц."""
+    missing = User.objects.filter(stats__isnull=True)
+    UserStats.objects.bulk_create(
+        UserStats(user_id=user_id)
+        for user_id in missing.values_list('pk', flat=True)
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post, 'author', 'user_id'),
+        followers_count=_count(Follow, 'author', 'user_id'),
+        following_count=_count(Follow, 'user', 'user_id'),
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
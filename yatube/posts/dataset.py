@@ -0,0 +1,223 @@
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from .importer import preserved_timestamps
+from .models import Comment, Follow, Group, Post, User
+from .utils import chunks
+
+BATCH_SIZE = 5000
+# Тексты постов и комментариев собираются из готовых предложений:
+# Faker на каждую строку занял бы большую часть времени генерации.
+SENTENCE_POOL = 2000
+IMAGE_FILES = 8
+# Показатели степени закона Ципфа: кто сколько пишет, на кого подписаны
+# и в какие группы пишут.
+AUTHOR_EXPONENT = 1.1
+FOLLOW_EXPONENT = 1.2
+GROUP_EXPONENT = 0.8
+NO_GROUP_SHARE = 0.3
+
+
+def zipf_weights(count, exponent):
+    """
+    Накопленные веса для random.choices(cum_weights=...): элемент
+    ранга r выбирается с вероятностью, пропорциональной 1 / r**exponent.
+    """
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class DatasetGenerator:
+    """
+    Воспроизводимый по seed набор данных: пользователи, группы, посты
+    с перекосом по авторам, комментарии, картинки и подписки, где число
+    подписчиков распределено по степенному закону. Популярность
+    пользователя одна и та же для числа его постов и подписчиков.
+    Всё пишется через bulk_create пачками с заранее известными id,
+    счётчики и индексы пересчитываются после генерации.
+    """
+
+    def __init__(self, posts, users=None, groups=None, comments=2.0,
+                 follows=10.0, images=0.05, days=365, seed=0):
+        self.posts = posts
+        self.users = users or max(posts // 20, 10)
+        self.groups = groups or max(posts // 5000, 3)
+        self.comments = comments
+        self.follows = follows
+        self.images = images
+        self.days = days
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+
+    def generate(self):
+        """Создаёт данные и возвращает число созданных объектов по моделям."""
+        self.sentences = [
+            self.faker.sentence(nb_words=self.rng.randint(4, 14))
+            for _ in range(SENTENCE_POOL)
+        ]
+        user_ids = self.create_users()
+        # Ранг популярности не совпадает с порядком создания.
+        self.rng.shuffle(user_ids)
+        self.user_ids = user_ids
+        self.user_weights = zipf_weights(len(user_ids), AUTHOR_EXPONENT)
+        self.group_ids = self.create_groups()
+        self.group_weights = zipf_weights(
+            len(self.group_ids), GROUP_EXPONENT)
+        self.image_names = self.create_images()
+        return {
+            'users': len(user_ids),
+            'groups': len(self.group_ids),
+            'posts': self.posts,
+            'comments': self.create_posts(),
+            'follows': self.create_follows(),
+        }
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(
+            self.sentences, k=self.rng.randint(low, high)))
+
+    def pick_users(self, count, weights=None):
+        return self.rng.choices(
+            self.user_ids, cum_weights=weights or self.user_weights,
+            k=count)
+
+    def create_users(self):
+        start = next_id(User)
+        password = make_password(None)
+        users = (
+            User(
+                pk=start + number,
+                username=f'{self.faker.user_name()}_{start + number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            ) for number in range(self.users)
+        )
+        for chunk in chunks(users, BATCH_SIZE):
+            User.objects.bulk_create(chunk)
+        return list(range(start, start + self.users))
+
+    def create_groups(self):
+        start = next_id(Group)
+        Group.objects.bulk_create(
+            Group(
+                pk=start + number,
+                title=f'{self.faker.word().capitalize()} {number + 1}',
+                slug=f'group-{start + number}',
+                description=self.faker.paragraph(),
+            ) for number in range(self.groups)
+        )
+        return list(range(start, start + self.groups))
+
+    def create_images(self):
+        """Несколько картинок, общих для постов с картинками."""
+        names = []
+        for number in range(IMAGE_FILES if self.images else 0):
+            name = f'posts/dataset_{self.seed}_{number}.jpg'
+            if not default_storage.exists(name):
+                image = Image.new('RGB', (1600, 900), self.color())
+                draw = ImageDraw.Draw(image)
+                for _ in range(20):
+                    x, y = self.rng.randrange(1600), self.rng.randrange(900)
+                    draw.rectangle(
+                        (x, y, x + self.rng.randrange(50, 600),
+                         y + self.rng.randrange(50, 400)),
+                        fill=self.color())
+                data = io.BytesIO()
+                image.save(data, 'JPEG', quality=85)
+                name = default_storage.save(name, ContentFile(data.getvalue()))
+            names.append(name)
+        return names
+
+    def color(self):
+        return tuple(self.rng.randrange(256) for _ in range(3))
+
+    def create_posts(self):
+        """Посты и комментарии к ним; возвращает число комментариев."""
+        start_id = next_id(Post)
+        comment_id = next_id(Comment)
+        first_date = timezone.now() - timedelta(days=self.days)
+        step = timedelta(days=self.days) / self.posts
+        comments_total = 0
+        for chunk in chunks(range(self.posts), BATCH_SIZE):
+            authors = self.pick_users(len(chunk))
+            posts, comments = [], []
+            for number, author_id in zip(chunk, authors):
+                pub_date = first_date + step * number
+                image = ''
+                if self.image_names and self.rng.random() < self.images:
+                    image = self.rng.choice(self.image_names)
+                posts.append(Post(
+                    pk=start_id + number,
+                    author_id=author_id,
+                    group_id=self.pick_group(),
+                    text=self.text(1, 6),
+                    image=image,
+                    pub_date=pub_date,
+                    updated=pub_date,
+                ))
+                count = int(self.rng.expovariate(1 / self.comments)
+                            if self.comments else 0)
+                for comment_author in self.pick_users(count):
+                    comments.append(Comment(
+                        pk=comment_id,
+                        post_id=start_id + number,
+                        author_id=comment_author,
+                        text=self.text(1, 2),
+                        created=pub_date + timedelta(
+                            minutes=self.rng.randint(1, 60 * 24 * 7)),
+                    ))
+                    comment_id += 1
+            with transaction.atomic():
+                with preserved_timestamps(Post):
+                    Post.objects.bulk_create(posts)
+                with preserved_timestamps(Comment):
+                    Comment.objects.bulk_create(comments)
+            comments_total += len(comments)
+        return comments_total
+
+    def pick_group(self):
+        if self.rng.random() < NO_GROUP_SHARE:
+            return None
+        return self.rng.choices(
+            self.group_ids, cum_weights=self.group_weights)[0]
+
+    def create_follows(self):
+        """
+        Каждый подписан в среднем на follows авторов; на кого — выбирается
+        по закону Ципфа, поэтому у немногих авторов основная доля
+        подписчиков.
+        """
+        weights = zipf_weights(len(self.user_ids), FOLLOW_EXPONENT)
+
+        def follows():
+            for user_id in self.user_ids:
+                count = min(int(self.rng.expovariate(1 / self.follows)),
+                            len(self.user_ids) - 1)
+                authors = set(self.pick_users(count, weights))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        total = 0
+        for chunk in chunks(follows(), BATCH_SIZE):
+            Follow.objects.bulk_create(chunk)
+            total += len(chunk)
+        return total
@@ -0,0 +1,130 @@
+import csv
+import json
+from collections import namedtuple
+
+from .models import Comment, Follow, Group, Post, User
+from .utils import chunks
+
+# Что выгружается из модели: поле даты для фильтра по периоду, поле
+# автора для фильтра по автору и колонки (имя, поле, связанная модель).
+# Внешние ключи на пользователей и группы выгружаются как username и slug.
+Export = namedtuple('Export', 'model date_field author_field columns')
+
+RELATED = {
+    'user': (User, 'username'),
+    'group': (Group, 'slug'),
+}
+
+EXPORTS = {
+    'posts': Export(Post, 'pub_date', 'author', (
+        ('id', 'pk', None),
+        ('author', 'author_id', 'user'),
+        ('group', 'group_id', 'group'),
+        ('pub_date', 'pub_date', None),
+        ('updated', 'updated', None),
+        ('text', 'text', None),
+        ('image', 'image', None),
+        ('comments_count', 'comments_count', None),
+    )),
+    'comments': Export(Comment, 'created', 'author', (
+        ('id', 'pk', None),
+        ('post', 'post_id', None),
+        ('author', 'author_id', 'user'),
+        ('created', 'created', None),
+        ('text', 'text', None),
+    )),
+    'follows': Export(Follow, None, 'author', (
+        ('id', 'pk', None),
+        ('user', 'user_id', 'user'),
+        ('author', 'author_id', 'user'),
+    )),
+}
+
+
+class BatchResolver:
+    """
+    Значения поля связанной модели по id. Недостающие id пачки читаются
+    одним запросом; запомненных значений не больше max_size.
+    """
+
+    def __init__(self, model, field, max_size):
+        self.model = model
+        self.field = field
+        self.max_size = max_size
+        self.values = {}
+
+    def load(self, ids):
+        missing = {pk for pk in ids if pk is not None} - self.values.keys()
+        if not missing:
+            return
+        if len(self.values) + len(missing) > self.max_size:
+            self.values.clear()
+        self.values.update(self.model._default_manager.filter(
+            pk__in=missing).values_list('pk', self.field))
+
+    def get(self, pk):
+        return self.values.get(pk)
+
+
+def export_queryset(export, since=None, until=None, author=None):
+    """
+    Строки values_list() в порядке id с фильтрами по автору и периоду;
+    обе границы периода включаются.
+    """
+    queryset = export.model._default_manager.order_by('pk')
+    if since is not None:
+        queryset = queryset.filter(**{f'{export.date_field}__gte': since})
+    if until is not None:
+        queryset = queryset.filter(**{f'{export.date_field}__lte': until})
+    if author is not None:
+        queryset = queryset.filter(**{export.author_field: author})
+    return queryset.values_list(
+        *(field for _, field, _ in export.columns))
+
+
+def export_rows(export, queryset, chunk_size):
+    """
+    Словари {колонка: значение}. Строки читаются iterator() пачками
+    по chunk_size, связанные значения пачки — одним запросом на модель,
+    так что память не зависит от числа строк.
+    """
+    resolvers = {
+        index: BatchResolver(*RELATED[related], chunk_size * 4)
+        for index, (_, _, related) in enumerate(export.columns) if related
+    }
+    names = [name for name, _, _ in export.columns]
+    for chunk in chunks(queryset.iterator(chunk_size=chunk_size),
+                        chunk_size):
+        for index, resolver in resolvers.items():
+            resolver.load(row[index] for row in chunk)
+        for row in chunk:
+            row = list(row)
+            for index, resolver in resolvers.items():
+                row[index] = resolver.get(row[index])
+            yield dict(zip(names, row))
+
+
+def plain(value):
+    """Даты — в ISO 8601 с микросекундами, чтобы импорт их не терял."""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def write_ndjson(rows, stream):
+    count = 0
+    for row in rows:
+        stream.write(json.dumps(
+            {name: plain(value) for name, value in row.items()},
+            ensure_ascii=False))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, stream, columns):
+    writer = csv.DictWriter(stream, [name for name, _, _ in columns])
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow({name: plain(value) for name, value in row.items()})
+        count += 1
+    return count
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .caching import cache_anonymous_page, generation_modified
+from .lookups import groups, users
+from .models import Post
+
+
+class LatestPostsFeed(Feed):
+    title = settings.TITLE_INDEX
+    link = reverse_lazy('posts:index')
+    description = 'Новые записи всех авторов Yatube'
+
+    def items(self):
+        return Post.objects.select_related('author', 'group')[
+            :settings.FEED_ITEMS]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(settings.FEED_TITLE_WORDS)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_author_link(self, post):
+        return reverse('posts:profile', args=[post.author.username])
+
+    def item_categories(self, post):
+        return (post.group.title,) if post.group else ()
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return groups.get_or_404(slug)
+
+    def title(self, group):
+        return f'Записи сообщества {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def description(self, group):
+        return group.description
+
+    def items(self, group):
+        return Post.objects.filter(group_id=group.pk).select_related(
+            'author', 'group')[:settings.FEED_ITEMS]
+
+
+class ProfilePostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return users.get_or_404(username)
+
+    def title(self, author):
+        return f'Записи пользователя {author.get_full_name() or author}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def description(self, author):
+        return self.title(author)
+
+    def items(self, author):
+        return Post.objects.filter(author_id=author.pk).select_related(
+            'author', 'group')[:settings.FEED_ITEMS]
+
+
+class AtomFeedMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj=None):
+        if callable(self.description):
+            return self.description(obj)
+        return self.description
+
+
+class LatestPostsAtomFeed(AtomFeedMixin, LatestPostsFeed):
+    pass
+
+
+class GroupPostsAtomFeed(AtomFeedMixin, GroupPostsFeed):
+    pass
+
+
+class ProfilePostsAtomFeed(AtomFeedMixin, ProfilePostsFeed):
+    pass
+
+
+# Ленты кэшируются как страницы для анонимных пользователей: рендерятся
+# один раз на поколение контента и отдаются с ETag и Last-Modified.
+index_rss = cache_anonymous_page(generation_modified)(
+    LatestPostsFeed())
+index_atom = cache_anonymous_page(generation_modified)(
+    LatestPostsAtomFeed())
+group_rss = cache_anonymous_page(generation_modified)(
+    GroupPostsFeed())
+group_atom = cache_anonymous_page(generation_modified)(
+    GroupPostsAtomFeed())
+profile_rss = cache_anonymous_page(generation_modified)(
+    ProfilePostsFeed())
+profile_atom = cache_anonymous_page(generation_modified)(
+    ProfilePostsAtomFeed())
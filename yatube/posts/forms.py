@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.forms import ModelForm
+from django.core.files.uploadedfile import UploadedFile
+from django.forms import ModelForm, ValidationError
 
+from .images import image_header, max_pixels, normalize_image
 from .models import Comment, Post
 
 User = get_user_model()
@@ -14,6 +17,29 @@ class PostForm(ModelForm):
                       'выберете наиболее подходящую группу из списка или '
                       'оставьте без группы'}
 
+    def clean_image(self):
+        """
+        Новая картинка проверяется по размеру из заголовка и только потом
+        декодируется: уменьшается, поворачивается по EXIF и теряет
+        метаданные (см. posts/images.py).
+        """
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        image_format, (width, height) = image_header(image)
+        limit = max_pixels(image_format)
+        if width * height > limit:
+            raise ValidationError(
+                'Слишком большое изображение: не больше '
+                f'{limit // 1_000_000} Мпикс.'
+            )
+        result = normalize_image(image, settings.POST_IMAGE_MAX_SIDE)
+        image.close()
+        # Как и исходную загрузку, временный файл закроет сам Django
+        # по завершении запроса.
+        self.files[self.add_prefix('image')] = result
+        return result
+
 
 class CommentForm(ModelForm):
     class Meta:
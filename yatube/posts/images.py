@@ -0,0 +1,61 @@
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, которые сохраняются как есть; остальные приводятся к JPEG.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'GIF': {},
+    'WEBP': {'quality': 90},
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Форматы, которые draft() декодирует сразу в уменьшенном масштабе.
+DRAFT_FORMATS = {'JPEG'}
+
+
+def image_header(file):
+    """Формат и размер картинки по заголовку файла, без декодирования."""
+    file.seek(0)
+    with Image.open(file) as image:
+        return image.format, image.size
+
+
+def max_pixels(image_format):
+    """
+    Наибольшее число пикселей картинки: остальные форматы декодируются
+    целиком, и память на обработку растёт с размером исходника.
+    """
+    if image_format in DRAFT_FORMATS:
+        return settings.POST_IMAGE_MAX_PIXELS
+    return settings.POST_IMAGE_MAX_DECODED_PIXELS
+
+
+def normalize_image(file, max_side):
+    """
+    Декодирует картинку ровно один раз и пишет результат во временный
+    файл на диске. JPEG декодируется сразу в уменьшенном масштабе
+    (draft), затем картинка уменьшается до max_side по большей стороне,
+    поворачивается по EXIF Orientation и сохраняется без метаданных.
+    """
+    file.seek(0)
+    with Image.open(file) as source:
+        image_format = source.format
+        if image_format not in SAVE_OPTIONS:
+            image_format = 'JPEG'
+        source.draft(source.mode, (max_side, max_side))
+        source.thumbnail((max_side, max_side), Image.LANCZOS)
+        image = ImageOps.exif_transpose(source)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    name = os.path.splitext(os.path.basename(file.name))[0]
+    result = TemporaryUploadedFile(
+        f'{name}.{EXTENSIONS[image_format]}',
+        Image.MIME[image_format], 0, None
+    )
+    image.save(result.file, image_format, **SAVE_OPTIONS[image_format])
+    result.size = result.file.tell()
+    result.seek(0)
+    return result
@@ -0,0 +1,222 @@
+import csv
+import gzip
+import json
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .caching import bump_generation
+from .lookups import groups, users
+from .models import Comment, Group, ImportedId, ImportRun, Post, User
+from .search import search_available
+
+# Поля с auto_now и auto_now_add, значения которых берутся из выгрузки.
+TIMESTAMP_FIELDS = {
+    Post: ('pub_date', 'updated'),
+    Comment: ('created',),
+}
+
+
+def read_rows(path, data_format):
+    """Строки NDJSON или CSV из файла; *.gz читается через gzip."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as file:
+        if data_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_moment(value):
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f'Некорректная дата: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_id(value):
+    return int(value) if value not in (None, '') else None
+
+
+@contextmanager
+def preserved_timestamps(model):
+    """
+    На время импорта отключает auto_now и auto_now_add, чтобы
+    bulk_create сохранил даты из выгрузки.
+    """
+    fields = [
+        model._meta.get_field(name) for name in TIMESTAMP_FIELDS[model]]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def refresh_derived_data(stdout):
+    """
+    Пересчитывает всё, что bulk_create не обновляет: счётчики, поисковый
+    индекс, материализованные ленты и кэши.
+    """
+    call_command('recount_counters', stdout=stdout)
+    if search_available():
+        call_command('rebuild_search_index', stdout=stdout)
+    if settings.FOLLOW_FEED_MATERIALIZED:
+        call_command('backfill_timeline', stdout=stdout)
+    users.clear()
+    groups.clear()
+    bump_generation()
+
+
+class Importer:
+    """
+    Пакетный импорт постов или комментариев в формате export_data.
+    Авторы и группы ищутся в словарях username -> id и slug -> id,
+    загруженных один раз. Отсутствующие создаются пакетом при
+    create_missing, иначе строки с ними пропускаются.
+
+    id из выгрузки сохраняется, если он свободен, иначе строка получает
+    новый id. Соответствие id выгрузки и базы хранится в ImportedId
+    импорта run и пишется в одной транзакции с пачкой вместе с
+    контрольной точкой run.rows: строки, которые уже в нём есть, повторно
+    не загружаются даже после сбоя. Комментарии привязываются к постам
+    через post_ids — такое же соответствие, полученное при импорте постов.
+    """
+
+    def __init__(self, model, run, create_missing=False, post_ids=None):
+        self.model = model
+        self.run = run
+        self.create_missing = create_missing
+        self.id_map = dict(run.ids.values_list('source_id', 'target_id'))
+        self.post_ids = post_ids or {}
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.skipped = 0
+        self.already_imported = 0
+
+    def add_missing(self, rows):
+        usernames = {row['author'] for row in rows} - self.users.keys()
+        slugs = {
+            row.get('group') for row in rows if row.get('group')
+        } - self.groups.keys()
+        if not self.create_missing or not (usernames or slugs):
+            return
+        unusable = make_password(None)
+        User.objects.bulk_create(
+            [User(username=name, password=unusable) for name in usernames],
+            ignore_conflicts=True)
+        self.users.update(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        Group.objects.bulk_create(
+            [Group(title=slug, slug=slug, description='') for slug in slugs],
+            ignore_conflicts=True)
+        self.groups.update(Group.objects.filter(
+            slug__in=slugs).values_list('slug', 'pk'))
+
+    def build_post(self, row, author_id):
+        group_id = None
+        if row.get('group'):
+            group_id = self.groups.get(row['group'])
+            if group_id is None:
+                return None
+        pub_date = parse_moment(row['pub_date'])
+        return Post(
+            pk=parse_id(row.get('id')),
+            author_id=author_id,
+            group_id=group_id,
+            text=row['text'],
+            image=row.get('image') or '',
+            pub_date=pub_date,
+            updated=parse_moment(row.get('updated')) or pub_date,
+        )
+
+    def build_comment(self, row, author_id, post_ids):
+        post_id = self.post_ids.get(parse_id(row['post']))
+        if post_id not in post_ids:
+            return None
+        return Comment(
+            pk=parse_id(row.get('id')),
+            post_id=post_id,
+            author_id=author_id,
+            text=row['text'],
+            created=parse_moment(row['created']),
+        )
+
+    def assign_ids(self, objects):
+        """
+        Оставляет объектам свободные id из выгрузки, занятым и повторным
+        выдаёт новые после наибольшего id в таблице и в пачке.
+        """
+        wanted = {obj.pk for obj in objects if obj.pk is not None}
+        taken = set(self.model.objects.filter(
+            pk__in=wanted).values_list('pk', flat=True))
+        last = self.model.objects.aggregate(last=Max('pk'))['last'] or 0
+        next_pk = max(last, *wanted, 0) + 1
+        used = set()
+        for obj in objects:
+            if obj.pk is None or obj.pk in taken or obj.pk in used:
+                obj.pk = next_pk
+                next_pk += 1
+            used.add(obj.pk)
+
+    def import_batch(self, rows):
+        """
+        Загружает пачку строк одной транзакцией вместе с соответствием
+        id и сдвигом контрольной точки. Возвращает число загруженных.
+        """
+        self.add_missing(rows)
+        if self.model is Comment:
+            post_ids = set(Post.objects.filter(pk__in={
+                self.post_ids.get(parse_id(row['post'])) for row in rows
+            }).values_list('pk', flat=True))
+        objects, sources, seen = [], [], set()
+        for row in rows:
+            source_id = parse_id(row.get('id'))
+            if source_id is not None and (
+                    source_id in self.id_map or source_id in seen):
+                self.already_imported += 1
+                continue
+            seen.add(source_id)
+            author_id = self.users.get(row['author'])
+            obj = None
+            if author_id is not None and self.model is Post:
+                obj = self.build_post(row, author_id)
+            elif author_id is not None:
+                obj = self.build_comment(row, author_id, post_ids)
+            if obj is None:
+                self.skipped += 1
+            else:
+                objects.append(obj)
+                sources.append(source_id)
+        with preserved_timestamps(self.model), transaction.atomic():
+            self.assign_ids(objects)
+            self.model.objects.bulk_create(objects)
+            pairs = [
+                (source_id, obj.pk)
+                for source_id, obj in zip(sources, objects)
+                if source_id is not None
+            ]
+            ImportedId.objects.bulk_create(
+                ImportedId(run=self.run, source_id=source_id,
+                           target_id=target_id)
+                for source_id, target_id in pairs
+            )
+            ImportRun.objects.filter(pk=self.run.pk).update(
+                rows=F('rows') + len(rows))
+        self.id_map.update(pairs)
+        return len(objects)
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+from .models import Group, User
+
+
+class LookupCache:
+    """
+    Кэш в памяти процесса для поиска объектов по уникальному полю.
+
+    Хранятся значения полей, а не сами объекты: каждый вызов get()
+    получает свежий экземпляр, поэтому закэшированные на нём связанные
+    объекты не переходят в другие запросы. Отсутствующие ключи тоже
+    запоминаются (на LOOKUP_CACHE_NEGATIVE_TIMEOUT), чтобы перебор
+    несуществующих адресов не доходил до базы. Изменения в этом процессе
+    сбрасывают записи сигналами, в других процессах — не позже
+    LOOKUP_CACHE_TIMEOUT. Поэтому часто меняющиеся поля, например
+    счётчики, в кэш не берутся: fields — хранимые поля, остальные
+    у экземпляра отложены и читаются из базы.
+    """
+
+    def __init__(self, model, field, fields=None):
+        self.model = model
+        self.field = field
+        self.attnames = [
+            f.attname for f in model._meta.concrete_fields
+            if fields is None or f.name in fields
+        ]
+        self.pk_index = self.attnames.index(model._meta.pk.attname)
+        self._entries = OrderedDict()
+        self._keys_by_pk = {}
+        self._lock = threading.Lock()
+
+    def get(self, value):
+        """Объект с полем field, равным value, или None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(value)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(value)
+                return self._instance(entry[1])
+        row = self.model._default_manager.filter(
+            **{self.field: value}).values_list(*self.attnames).first()
+        if row is None:
+            expires = now + settings.LOOKUP_CACHE_NEGATIVE_TIMEOUT
+        else:
+            expires = now + settings.LOOKUP_CACHE_TIMEOUT
+        with self._lock:
+            self._entries[value] = expires, row
+            self._entries.move_to_end(value)
+            if row is not None:
+                self._keys_by_pk.setdefault(
+                    row[self.pk_index], set()).add(value)
+            while len(self._entries) > settings.LOOKUP_CACHE_MAX_SIZE:
+                self._forget(next(iter(self._entries)))
+        return self._instance(row)
+
+    def get_or_404(self, value):
+        obj = self.get(value)
+        if obj is None:
+            raise Http404(
+                f'{self.model._meta.verbose_name} {value} не найден')
+        return obj
+
+    def invalidate(self, pk=None, value=None):
+        """Сбрасывает записи объекта pk и записи по ключу value."""
+        with self._lock:
+            for key in self._keys_by_pk.pop(pk, ()):
+                self._forget(key)
+            self._forget(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_pk.clear()
+
+    def _forget(self, value):
+        entry = self._entries.pop(value, None)
+        if entry is not None and entry[1] is not None:
+            pk = entry[1][self.pk_index]
+            keys = self._keys_by_pk.get(pk, set())
+            keys.discard(value)
+            if not keys:
+                self._keys_by_pk.pop(pk, None)
+
+    def _instance(self, row):
+        if row is None:
+            return None
+        return self.model.from_db(DEFAULT_DB_ALIAS, self.attnames, row)
+
+
+groups = LookupCache(Group, 'slug', ('id', 'slug', 'title', 'description'))
+users = LookupCache(User, 'username')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import FeedEntry, Follow
+from posts.timeline import add_author_to_timeline
+
+
+class Command(BaseCommand):
+    help = 'Заполняет материализованные ленты подписок из Follow и Post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить существующие записи лент перед заполнением.',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            FeedEntry.objects.all().delete()
+        follows = Follow.objects.order_by('pk').values_list(
+            'user_id', 'author_id')
+        count = 0
+        for user_id, author_id in follows.iterator():
+            add_author_to_timeline(user_id, author_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано подписок: {count}, '
+            f'записей в лентах: {FeedEntry.objects.count()}'
+        ))
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from posts.caching import bump_generation
+from posts.models import Follow, Post
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает HTML-страницы лент и поста с JSON API: время '
+            'ответа, размер и число запросов, а также проверку ETag.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Сбрасывать кэши списков перед каждым запросом.')
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').first()
+        follow = Follow.objects.select_related('user').first()
+        if post is None or post.group is None or follow is None:
+            raise CommandError(
+                'Нужны пост с группой и хотя бы одна подписка.')
+        client = Client()
+        client.force_login(follow.user)
+        routes = (
+            ('index', [], 'api_index'),
+            ('group_list', [post.group.slug], 'api_group_list'),
+            ('profile', [post.author.username], 'api_profile'),
+            ('post_detail', [post.pk], 'api_post_detail'),
+            ('follow_index', [], 'api_follow_index'),
+        )
+        self.stdout.write(
+            f'{"страница":<14} {"":<5} {"мс":>8} {"байт":>8} '
+            f'{"запросов":>9} {"304, мс":>8}'
+        )
+        for name, args, api_name in routes:
+            for kind, url in (
+                ('html', reverse(f'posts:{name}', args=args)),
+                ('api', reverse(f'posts:{api_name}', args=args)),
+            ):
+                elapsed, size, queries, revalidate = self.bench(
+                    client, url, options['repeat'], options['cold'])
+                self.stdout.write(
+                    f'{name:<14} {kind:<5} {elapsed:8.2f} {size:8} '
+                    f'{queries:9} {revalidate:8.2f}'
+                )
+
+    @staticmethod
+    def bench(client, url, repeat, cold):
+        response = client.get(url)
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # Журнал запросов соединения очищается в начале каждого запроса
+        # к сайту, поэтому запросы считаются обёрткой.
+        with connection.execute_wrapper(count_query):
+            client.get(url)
+        total = 0
+        for _ in range(repeat):
+            if cold:
+                bump_generation()
+            start = time.perf_counter()
+            client.get(url)
+            total += time.perf_counter() - start
+        etag = response.get('ETag')
+        revalidate = float('nan')
+        if etag:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                client.get(url, HTTP_IF_NONE_MATCH=etag)
+            revalidate = (time.perf_counter() - start) / repeat * 1000
+        return (total / repeat * 1000, len(response.content),
+                len(queries), revalidate)
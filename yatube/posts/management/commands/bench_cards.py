@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context, Template
+
+from posts.cards import CardRenderer, card_key, render_post_cards
+from posts.models import Post
+
+# Карточки в том виде, в каком их рендерили шаблоны списков.
+TEMPLATE_CARDS = Template('''{% load thumbnail %}{% for post in posts %}
+<article>
+  <ul>
+    <li>Автор: {% if post.author.get_full_name %}
+        {{ post.author.get_full_name }}
+      {% else %}
+        {{ post.author }}
+      {% endif %}
+      <a href="{% url 'posts:profile' post.author %}"
+        >все посты пользователя</a></li>
+    <li>Дата публикации: {{ post.pub_date|date:"d E Y" }}</li>
+  </ul>
+  {% thumbnail post.image "960x339" crop="center" upscale=True as im %}
+    <img class="card-img my-2" src="{{ im.url }}">
+  {% endthumbnail %}
+  <p>{{ post.text }}</p>
+  <a href="{% url 'posts:post_detail' post.pk %}">подробная информация </a>
+  {% if post.group %}
+    <br>
+    <a href="{% url 'posts:group_list' post.group.slug %}"
+      >все записи группы</a>
+  {% endif %}
+</article>
+{% if not forloop.last %}<hr>{% endif %}
+{% endfor %}''')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендеринга страницы карточек постов '
+            'шаблоном и CardRenderer, с кэшем карточек и без него.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=settings.POSTS_TO_OUTPUT)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.select_related('author', 'group')[
+            :options['posts']])
+        if not posts:
+            raise CommandError('В базе нет постов для замера.')
+        repeat = options['repeat']
+        keys = [card_key(post) for post in posts]
+
+        def cold_cards():
+            cache.delete_many(keys)
+            render_post_cards(posts)
+
+        results = (
+            ('template', lambda: TEMPLATE_CARDS.render(
+                Context({'posts': posts}))),
+            ('renderer', lambda: CardRenderer().render_many(posts)),
+            ('post_cards, cold cache', cold_cards),
+            ('post_cards, warm cache', lambda: render_post_cards(posts)),
+        )
+        render_post_cards(posts)
+        self.stdout.write(f'{len(posts)} карточек, {repeat} повторов')
+        for name, func in results:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            self.stdout.write(f'{name:<24} {elapsed:8.3f} мс на страницу')
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import RouteBenchmark, compare, dataset_meta
+
+
+def format_ms(value):
+    return f'{value:8.2f}' if value is not None else f'{"-":>8}'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет все маршруты posts и users для анонима и вошедшего '
+            'пользователя: запросы к базе, время и пик памяти. Результат '
+            'в JSON можно сравнить с прогоном на другом коммите.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Сбрасывать кэши списков перед каждым запросом.')
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.')
+
+    def handle(self, *args, **options):
+        benchmark = RouteBenchmark(options['repeat'], options['cold'])
+        try:
+            results = benchmark.run()
+        except ValueError as error:
+            raise CommandError(f'{error} Заполните базу generate_dataset.')
+        self.stdout.write(
+            f'{"маршрут":<26} {"роль":<9} {"код":>4} {"запросов":>9} '
+            f'{"мс":>8} {"КБ":>8}'
+        )
+        for row in results:
+            self.stdout.write(
+                f'{row["route"]:<26} {row["role"]:<9} {row["status"]:4} '
+                f'{row["queries"]:9} '
+                f'{format_ms((row["ms"] or {}).get("median"))} '
+                f'{row["peak_kb"]:8.1f}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'meta': dict(
+                        dataset_meta(), repeat=options['repeat'],
+                        cold=options['cold']),
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['results']
+            self.stdout.write(
+                '\nСравнение: запросов было/стало, мс было/стало')
+            for (route, role, old_queries, queries,
+                 old_ms, new_ms) in compare(results, previous):
+                self.stdout.write(
+                    f'{route:<26} {role:<9} {old_queries:5} {queries:5} '
+                    f'{format_ms(old_ms)} {format_ms(new_ms)}'
+                )
@@ -0,0 +1,107 @@
+import gzip
+import io
+from contextlib import contextmanager
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts.export import (EXPORTS, export_queryset, export_rows, write_csv,
+                          write_ndjson)
+from posts.lookups import users
+
+
+def parse_moment(value, end=False):
+    """
+    Дата или дата со временем из командной строки. Обе границы периода
+    включаются; для даты без времени с end=True берётся последний момент
+    дня, чтобы период включал его целиком.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Некорректная дата: {value}')
+        moment = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@contextmanager
+def open_output(path, compress, stdout):
+    """
+    Текстовый поток в файл или в stdout команды, при compress — через
+    gzip. Если у stdout нет двоичного буфера (StringIO из call_command),
+    текст пишется в него напрямую.
+    """
+    if path == '-' and not hasattr(stdout, 'buffer'):
+        if compress:
+            raise CommandError(
+                'Сжатую выгрузку в этот поток не записать, укажите --output.')
+        stdout.ending = ''
+        yield stdout
+        return
+    binary = stdout.buffer if path == '-' else open(path, 'wb')
+    target = gzip.GzipFile(fileobj=binary, mode='wb') if compress else binary
+    stream = io.TextIOWrapper(target, encoding='utf-8', newline='')
+    try:
+        yield stream
+    finally:
+        stream.flush()
+        stream.detach()
+        if compress:
+            target.close()
+        if path == '-':
+            binary.flush()
+        else:
+            binary.close()
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты, комментарии или подписки '
+            'в NDJSON или CSV с постоянным расходом памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(EXPORTS))
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson')
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки; по умолчанию stdout.')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать выгрузку; включается и для файла *.gz.')
+        parser.add_argument('--since', help='Не раньше даты (включительно).')
+        parser.add_argument('--until', help='Не позже даты (включительно).')
+        parser.add_argument('--author', help='Только записи автора.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        export = EXPORTS[options['model']]
+        since = until = author = None
+        if options['since'] or options['until']:
+            if export.date_field is None:
+                raise CommandError(
+                    f'У {options["model"]} нет даты для фильтра.')
+            if options['since']:
+                since = parse_moment(options['since'])
+            if options['until']:
+                until = parse_moment(options['until'], end=True)
+        if options['author']:
+            author = users.get(options['author'])
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден.')
+        rows = export_rows(
+            export, export_queryset(export, since, until, author),
+            options['chunk_size'])
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+        with open_output(output, compress, self.stdout) as stream:
+            if options['format'] == 'csv':
+                count = write_csv(rows, stream, export.columns)
+            else:
+                count = write_ndjson(rows, stream)
+        self.stderr.write(f'Выгружено записей: {count}')
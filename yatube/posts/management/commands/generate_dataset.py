@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.dataset import DatasetGenerator
+from posts.importer import refresh_derived_data
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет пустую базу воспроизводимым набором данных для '
+            'замеров: --posts 10000, 100000 или 1000000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument(
+            '--users', type=int, help='По умолчанию posts / 20.')
+        parser.add_argument(
+            '--groups', type=int, help='По умолчанию posts / 5000.')
+        parser.add_argument(
+            '--comments', type=float, default=2.0,
+            help='Среднее число комментариев к посту.')
+        parser.add_argument(
+            '--follows', type=float, default=10.0,
+            help='Среднее число подписок пользователя.')
+        parser.add_argument(
+            '--images', type=float, default=0.05,
+            help='Доля постов с картинкой.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if Post.objects.exists():
+            raise CommandError('Набор данных создаётся только в пустой базе.')
+        start = time.perf_counter()
+        counts = DatasetGenerator(
+            posts=options['posts'],
+            users=options['users'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            seed=options['seed'],
+        ).generate()
+        refresh_derived_data(self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{name}: {count}' for name, count in counts.items())
+            + f' за {time.perf_counter() - start:.1f} с'
+        ))
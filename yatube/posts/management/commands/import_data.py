@@ -0,0 +1,98 @@
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import Importer, read_rows, refresh_derived_data
+from posts.models import Comment, ImportRun, Post
+from posts.utils import chunks
+
+MODELS = {'posts': Post, 'comments': Comment}
+
+
+def read_id_map(path):
+    """Соответствие id выгрузки и базы: строки «id_в_выгрузке id_в_базе»."""
+    with open(path, encoding='utf-8') as file:
+        return dict(
+            (int(source), int(target))
+            for source, target in (line.split() for line in file)
+        )
+
+
+def write_id_map(path, run):
+    """Выгрузка соответствия id импорта run в файл формата read_id_map."""
+    temporary = f'{path}.tmp'
+    pairs = run.ids.order_by('source_id').values_list(
+        'source_id', 'target_id')
+    with open(temporary, 'w', encoding='utf-8') as file:
+        file.writelines(
+            f'{source} {target}\n' for source, target in pairs.iterator())
+    os.replace(temporary, path)
+
+
+class Command(BaseCommand):
+    help = ('Пакетно загружает посты или комментарии из NDJSON или CSV '
+            'в формате export_data с сохранением дат. Занятые id заменяются '
+            'новыми; соответствие id и контрольная точка хранятся в базе, '
+            'так что прерванный импорт продолжается без дублей. В конце '
+            'соответствие выгружается в файл --id-map, по которому '
+            'комментарии привязываются к постам (--post-ids). Счётчики, '
+            'поисковый индекс и ленты подписок обновляются один раз '
+            'в конце.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(MODELS))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать отсутствующих авторов и группы.')
+        parser.add_argument(
+            '--id-map',
+            help='Куда выгрузить соответствие id выгрузки и базы; '
+                 'по умолчанию <path>.ids.')
+        parser.add_argument(
+            '--post-ids',
+            help='Для комментариев: файл соответствия id, записанный '
+                 'при импорте постов.')
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        if model is Comment and not (
+                options['post_ids'] and os.path.exists(options['post_ids'])):
+            raise CommandError(
+                'Для комментариев нужен --post-ids: файл соответствия id, '
+                'записанный при импорте постов.')
+        source = os.path.abspath(options['path'])
+        id_map = options['id_map'] or f'{source}.ids'
+        run, _ = ImportRun.objects.get_or_create(source=source)
+        done = run.rows
+        if done:
+            self.stdout.write(f'Продолжение после строки {done}')
+        importer = Importer(
+            model, run, options['create_missing'],
+            read_id_map(options['post_ids']) if model is Comment else None)
+        rows = islice(read_rows(source, options['format']), done, None)
+        start = time.perf_counter()
+        read = imported = 0
+        for batch in chunks(rows, options['batch_size']):
+            imported += importer.import_batch(batch)
+            read += len(batch)
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{done + read} строк, {read / elapsed:.0f} строк/с')
+        elapsed = time.perf_counter() - start
+        refresh_derived_data(self.stdout)
+        write_id_map(id_map, run)
+        # Файл загружен целиком: повторный запуск прочитает его с начала
+        # и пропустит строки, id которых уже есть в соответствии.
+        ImportRun.objects.filter(pk=run.pk).update(rows=0)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {imported}, пропущено: {importer.skipped}, '
+            f'загружено ранее: {importer.already_imported}, '
+            f'{elapsed:.1f} с, {read / max(elapsed, 1e-9):.0f} строк/с'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import rebuild_index, search_available
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов (SQLite FTS5).'
+
+    def handle(self, *args, **options):
+        if not search_available():
+            raise CommandError(
+                'Полнотекстовый поиск работает только с SQLite.')
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {count}'))
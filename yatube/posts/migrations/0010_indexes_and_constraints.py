@@ -0,0 +1,84 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:13
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import (Count, F, IntegerField, Min, OuterRef,
+                              Subquery)
+from django.db.models.functions import Coalesce
+
+
+def follow_count(Follow, field):
+    return Coalesce(
+        Subquery(
+            Follow.objects.filter(
+                **{field: OuterRef('user_id')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def remove_invalid_follows(apps, schema_editor):
+    """
+    Удаляет подписки на себя и повторные подписки и пересчитывает
+    счётчики подписок их участников, заполненные в 0009.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    affected = set()
+    invalid = Follow.objects.filter(user=F('author'))
+    affected.update(invalid.values_list('user_id', flat=True))
+    invalid.delete()
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        Follow.objects.filter(
+            user=duplicate['user'], author=duplicate['author']
+        ).exclude(id=duplicate['first_id']).delete()
+        affected.update((duplicate['user'], duplicate['author']))
+    affected = sorted(affected)
+    for start in range(0, len(affected), 500):
+        UserStats.objects.filter(
+            user_id__in=affected[start:start + 500]
+        ).update(
+            followers_count=follow_count(Follow, 'author'),
+            following_count=follow_count(Follow, 'user'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_invalid_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_following'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='self_follow'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-18 22:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feedentry_index_post'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=1024, unique=True, verbose_name='Файл выгрузки')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+            ],
+            options={
+                'verbose_name': 'Импорт',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedId',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_id', models.BigIntegerField(verbose_name='id в выгрузке')),
+                ('target_id', models.BigIntegerField(verbose_name='id в базе')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ids', to='posts.ImportRun')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importedid',
+            constraint=models.UniqueConstraint(fields=('run', 'source_id'), name='unique_imported_id'),
+        ),
+    ]
@@ -9,6 +9,11 @@ class Group(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     slug = models.SlugField('Идентификатор', unique=True)
     description = models.TextField('Описание')
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Group'
@@ -29,6 +34,10 @@ class Post(models.Model):
         'Дата создания',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -50,11 +59,32 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы повторяют сортировку списков (-pub_date, -id),
+        # см. posts.utils.paginate_queryset.
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+        )
 
 
 class Comment(models.Model):
@@ -79,11 +109,42 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
 
 
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляются сигналами (см. counters.py)."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -97,6 +158,77 @@ class Follow(models.Model):
     )
 
     class Meta:
-        UniqueConstraint(fields=['user', 'author'], name='unique_following')
-        CheckConstraint(check=~models.Q(
-            user=models.F('author')), name='self_follow')
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_following'
+            ),
+            CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='self_follow'
+            ),
+        )
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_pub_date_post_idx'
+            ),
+        )
+
+
+class ImportRun(models.Model):
+    """
+    Импорт файла командой import_data. rows — контрольная точка: сколько
+    строк файла уже обработано. Меняется в одной транзакции с пачкой.
+    """
+    source = models.CharField('Файл выгрузки', max_length=1024, unique=True)
+    rows = models.PositiveIntegerField('Обработано строк', default=0)
+
+    class Meta:
+        verbose_name = 'Импорт'
+
+    def __str__(self):
+        return self.source
+
+
+class ImportedId(models.Model):
+    """Соответствие id строки выгрузки и id записи в базе."""
+    run = models.ForeignKey(
+        ImportRun,
+        on_delete=models.CASCADE,
+        related_name='ids'
+    )
+    source_id = models.BigIntegerField('id в выгрузке')
+    target_id = models.BigIntegerField('id в базе')
+
+    class Meta:
+        constraints = (
+            UniqueConstraint(
+                fields=('run', 'source_id'),
+                name='unique_imported_id'
+            ),
+        )
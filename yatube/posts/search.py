@@ -0,0 +1,98 @@
+import re
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+# Слова запроса; каждое ищется как отдельный термин FTS5, поэтому
+# операторы и кавычки из ввода пользователя не попадают в MATCH.
+WORD = re.compile(r'\w+')
+
+
+def search_available():
+    """Полнотекстовый индекс есть только в SQLite (FTS5)."""
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post_id, text):
+    """Заменяет текст поста в индексе: rowid строки индекса — id поста."""
+    if not search_available():
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post_id, text]
+        )
+
+
+def unindex_post(post_id):
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Заново строит индекс по всем постам; возвращает число записей."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+        count = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def match_expression(query):
+    """Запрос FTS5 из слов ввода: все слова должны встретиться в посте."""
+    return ' '.join(f'"{word}"' for word in WORD.findall(query))
+
+
+def matching_ids(query):
+    """
+    id постов, подходящих под запрос, от более релевантных к менее
+    (bm25). Оценка bm25 считается для каждого совпадения, поэтому
+    ранжируются только SEARCH_MAX_CANDIDATES самых новых: их граница
+    по rowid находится по индексу без оценки. Отдаётся не больше
+    SEARCH_MAX_RESULTS id; к таблице постов запрос не обращается.
+    """
+    expression = match_expression(query)
+    if not expression or not search_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'AND rowid >= COALESCE(('
+            f'SELECT MIN(rowid) FROM (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s)'
+            '), 0) ORDER BY rank LIMIT %s',
+            [expression, expression, settings.SEARCH_MAX_CANDIDATES,
+             settings.SEARCH_MAX_RESULTS]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_posts(query, page_number):
+    """
+    Страница найденных постов в порядке релевантности. Посты страницы
+    вместе с авторами и группами загружаются одним запросом. Признак
+    truncated значит, что совпадений могло быть больше, чем найдено:
+    результаты ограничены SEARCH_MAX_CANDIDATES и SEARCH_MAX_RESULTS.
+    """
+    ids = matching_ids(query)
+    paginator = Paginator(ids, settings.POSTS_TO_OUTPUT)
+    page = paginator.get_page(page_number)
+    page.truncated = len(ids) >= min(
+        settings.SEARCH_MAX_CANDIDATES, settings.SEARCH_MAX_RESULTS)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        page.object_list)
+    page.object_list = [posts[pk] for pk in page.object_list if pk in posts]
+    return page
@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters
+from .caching import bump_generation
+from .lookups import groups, users
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .search import index_post, unindex_post
+from .tasks import run_in_background
+from .thumbnails import end_request_memo, start_request_memo
+from .timeline import (add_author_to_timeline, fan_out_post,
+                       remove_author_from_timeline)
+
+
+@receiver(post_save, sender=User)
+def user_create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_forget(sender, instance, **kwargs):
+    groups.invalidate(instance.pk, instance.slug)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_forget(sender, instance, **kwargs):
+    users.invalidate(instance.pk, instance.username)
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Имя автора выводится в списках постов. Сохранения только служебных
+    полей, например last_login при входе, списки не сбрасывают.
+    """
+    if created or (update_fields and not set(update_fields) & {
+            'username', 'first_name', 'last_name'}):
+        return
+    bump_generation()
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_previous(sender, instance, raw=False, **kwargs):
+    """
+    Группа и автор поста до сохранения: обе можно сменить в админке,
+    и тогда счётчик переносится со старых на новые.
+    """
+    instance._previous_group_id = instance._previous_author_id = None
+    if instance.pk and not raw:
+        instance._previous_group_id, instance._previous_author_id = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'author_id').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+def post_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        counters.bump_group(instance.group_id, 1)
+        return
+    if instance._previous_group_id != instance.group_id:
+        counters.bump_group(instance._previous_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+    if (instance._previous_author_id is not None
+            and instance._previous_author_id != instance.author_id):
+        counters.bump_user(instance._previous_author_id, posts_count=-1)
+        counters.bump_user(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def content_changed(sender, **kwargs):
+    bump_generation()
+
+
+@receiver(post_save, sender=Post)
+def post_index(sender, instance, **kwargs):
+    index_post(instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindex(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created and settings.FOLLOW_FEED_MATERIALIZED:
+        run_in_background(fan_out_post, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_fill_timeline(sender, instance, created, **kwargs):
+    if created and settings.FOLLOW_FEED_MATERIALIZED:
+        run_in_background(
+            add_author_to_timeline, instance.user_id, instance.author_id
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_clear_timeline(sender, instance, **kwargs):
+    if settings.FOLLOW_FEED_MATERIALIZED:
+        remove_author_from_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(request_started)
+def thumbnails_memo_start(sender, **kwargs):
+    start_request_memo()
+
+
+@receiver(request_finished)
+def thumbnails_memo_end(sender, **kwargs):
+    end_request_memo()
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_WORKERS,
+    thread_name_prefix='posts-tasks',
+)
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    finally:
+        # У каждого потока своё соединение с базой, закрываем его за собой.
+        connection.close()
+
+
+def run_in_background(func, *args):
+    """
+    Выполняет func(*args) в фоновом потоке после коммита транзакции.
+    При BACKGROUND_TASKS_SYNC задача выполняется сразу (нужно для тестов).
+    """
+    if settings.BACKGROUND_TASKS_SYNC:
+        func(*args)
+        return
+    transaction.on_commit(lambda: _executor.submit(_run, func, *args))
@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_post_cards
+
+register = template.Library()
+
+
+@register.filter
+def post_cards(posts):
+    """
+    Готовый HTML карточек постов страницы:
+    {% for card in page_obj|post_cards %}{{ card }}{% endfor %}.
+    """
+    return [mark_safe(card) for card in render_post_cards(posts)]
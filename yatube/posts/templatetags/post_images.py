@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import picture_html
+from posts.thumbnails import post_pictures
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(post, name='card'):
+    """
+    Картинка поста с адаптивными вариантами миниатюры name или оригинал,
+    пока миниатюры не готовы: {% post_picture post 'card' %}.
+    """
+    picture = post_pictures([post], name).get(post.pk)
+    return mark_safe(picture_html(picture)) if picture else ''
@@ -0,0 +1,403 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+from datetime import timedelta
+from io import BytesIO, StringIO, TextIOWrapper
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import models
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.benchmark import ROLES, routes
+from posts.export import plain
+from posts.importer import Importer
+from posts.models import (Comment, Follow, Group, ImportRun, Post, User,
+                          UserStats)
+from posts.search import search_posts
+
+AUTHOR_USERNAME = 'HasNoName'
+USER_USERNAME = 'TestUser'
+GROUP_SLUG = 'test-slug'
+POST_TEXT = 'Тестовый пост'
+EXPORT_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ExportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.reader = User.objects.create_user(username=USER_USERNAME)
+        cls.group = Group.objects.create(
+            title='Группа', slug=GROUP_SLUG, description='-')
+        cls.old_post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Старый пост, "с" ;')
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.now() - timedelta(days=10))
+        cls.post = Post.objects.create(author=cls.reader, text=POST_TEXT)
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(EXPORT_DIR, ignore_errors=True)
+
+    def export(self, *args, name='export.ndjson'):
+        path = os.path.join(EXPORT_DIR, name)
+        call_command('export_data', *args, '--output', path,
+                     stderr=StringIO())
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', newline='') as file:
+            return file.read()
+
+    def ndjson(self, *args, **kwargs):
+        return [json.loads(line)
+                for line in self.export(*args, **kwargs).splitlines()]
+
+    def test_ndjson_resolves_related_keys(self):
+        rows = self.ndjson('posts')
+        self.assertEqual([row['id'] for row in rows],
+                         [ExportDataTest.old_post.pk, ExportDataTest.post.pk])
+        self.assertEqual(rows[0]['author'], AUTHOR_USERNAME)
+        self.assertEqual(rows[0]['group'], GROUP_SLUG)
+        self.assertIsNone(rows[1]['group'])
+        self.assertEqual(self.ndjson('follows'), [{
+            'id': Follow.objects.get().pk,
+            'user': USER_USERNAME,
+            'author': AUTHOR_USERNAME,
+        }])
+        comment, = self.ndjson('comments')
+        self.assertEqual(comment['post'], ExportDataTest.post.pk)
+        self.assertEqual(comment['author'], AUTHOR_USERNAME)
+
+    def test_csv_and_gzip(self):
+        content = self.export(
+            'posts', '--format', 'csv', name='posts.csv.gz')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(rows[0]['text'], ExportDataTest.old_post.text)
+        self.assertEqual(rows[1]['group'], '')
+
+    def test_stdout_captured(self):
+        """Выгрузка без --output идёт в stdout команды."""
+        out = StringIO()
+        call_command('export_data', 'follows', stdout=out, stderr=StringIO())
+        self.assertEqual(json.loads(out.getvalue())['user'], USER_USERNAME)
+        binary = BytesIO()
+        stdout = TextIOWrapper(binary)
+        call_command('export_data', 'posts', '--format', 'csv', '--gzip',
+                     stdout=stdout, stderr=StringIO())
+        rows = list(csv.DictReader(
+            StringIO(gzip.decompress(binary.getvalue()).decode())))
+        self.assertEqual(rows[0]['text'], ExportDataTest.old_post.text)
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'posts', '--gzip',
+                         stdout=StringIO(), stderr=StringIO())
+
+    def test_filters(self):
+        day = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(
+            [row['id'] for row in self.ndjson('posts', '--since', str(day))],
+            [ExportDataTest.post.pk])
+        self.assertEqual(
+            [row['id'] for row in self.ndjson('posts', '--until', str(day))],
+            [ExportDataTest.old_post.pk])
+        self.assertEqual(
+            [row['author'] for row in self.ndjson(
+                'posts', '--author', USER_USERNAME)],
+            [USER_USERNAME])
+        with self.assertRaises(CommandError):
+            self.export('follows', '--since', str(day))
+        with self.assertRaises(CommandError):
+            self.export('posts', '--author', 'unknown')
+
+    def test_period_bounds_inclusive(self):
+        """Пост с датой ровно на границе периода попадает в выгрузку."""
+        old_post = ExportDataTest.old_post
+        old_post.refresh_from_db()
+        moment = old_post.pub_date.isoformat()
+        self.assertEqual(
+            [row['id'] for row in self.ndjson(
+                'posts', '--since', moment, '--until', moment)],
+            [old_post.pk])
+
+    def test_memory_does_not_grow_with_rows(self):
+        """Пик памяти выгрузки почти не зависит от числа строк."""
+        peaks = []
+        for total in (500, 5000):
+            Post.objects.bulk_create(
+                Post(author=ExportDataTest.author, text=POST_TEXT * 10)
+                for _ in range(total - Post.objects.count())
+            )
+            tracemalloc.start()
+            call_command(
+                'export_data', 'posts', '--chunk-size', '200', '--output',
+                os.path.join(EXPORT_DIR, 'memory.ndjson'), stderr=StringIO())
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], peaks[0] * 1.5, peaks)
+
+
+class ImportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = Group.objects.create(
+            title='Группа', slug=GROUP_SLUG, description='-')
+        cls.pub_date = timezone.now() - timedelta(days=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(EXPORT_DIR, ignore_errors=True)
+
+    def write(self, name, rows):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = os.path.join(EXPORT_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, default=plain) + '\n')
+        return path
+
+    def post_rows(self, total, author=AUTHOR_USERNAME):
+        return [{
+            'id': 1000 + number,
+            'author': author,
+            'group': GROUP_SLUG if number % 2 else None,
+            'pub_date': self.pub_date + timedelta(minutes=number),
+            'text': f'Импортированный пост {number}',
+            'image': '',
+        } for number in range(total)]
+
+    def import_data(self, *args):
+        out = StringIO()
+        call_command('import_data', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_preserves_ids_dates_and_recounts(self):
+        posts = self.write('posts.ndjson', self.post_rows(5))
+        comments = self.write('comments.ndjson', [{
+            'id': 7, 'post': 1001, 'author': AUTHOR_USERNAME,
+            'created': self.pub_date, 'text': 'Импортированный комментарий',
+        }])
+        out = self.import_data('posts', posts, '--batch-size', '2')
+        self.assertIn('Загружено: 5', out)
+        self.assertIn('строк/с', out)
+        self.import_data('comments', comments, '--post-ids', f'{posts}.ids')
+        post = Post.objects.get(pk=1001)
+        self.assertEqual(post.pub_date, self.pub_date + timedelta(minutes=1))
+        self.assertEqual(post.updated, post.pub_date)
+        self.assertEqual(post.group, ImportDataTest.group)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get(pk=7).created, self.pub_date)
+        ImportDataTest.author.stats.refresh_from_db()
+        self.assertEqual(ImportDataTest.author.stats.posts_count, 5)
+        ImportDataTest.group.refresh_from_db()
+        self.assertEqual(ImportDataTest.group.posts_count, 2)
+        self.assertEqual(
+            search_posts('Импортированный', None).paginator.count, 5)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_taken_ids_remapped(self):
+        """
+        Занятые id получают новые значения, комментарии попадают
+        к импортированному посту, а повторный импорт ничего не дублирует.
+        """
+        local = Post.objects.create(
+            pk=1001, author=ImportDataTest.author, text='Местный пост')
+        posts = self.write('taken.ndjson', self.post_rows(3))
+        comments = self.write('taken-comments.ndjson', [{
+            'id': local.pk, 'post': 1001, 'author': AUTHOR_USERNAME,
+            'created': self.pub_date, 'text': 'Импортированный комментарий',
+        }])
+        self.assertIn('Загружено: 3', self.import_data('posts', posts))
+        self.import_data('comments', comments, '--post-ids', f'{posts}.ids')
+        imported = Post.objects.get(text='Импортированный пост 1')
+        self.assertNotEqual(imported.pk, local.pk)
+        self.assertEqual(Post.objects.get(pk=1002).text,
+                         'Импортированный пост 2')
+        self.assertEqual(
+            imported.comments.get().text, 'Импортированный комментарий')
+        self.assertFalse(local.comments.exists())
+        out = self.import_data('posts', posts)
+        self.assertIn('Загружено: 0', out)
+        self.assertIn('загружено ранее: 3', out)
+        self.assertEqual(Post.objects.count(), 4)
+
+    def test_comments_require_post_ids(self):
+        path = self.write('orphans.ndjson', [])
+        with self.assertRaises(CommandError):
+            self.import_data('comments', path)
+
+    def test_unknown_authors(self):
+        path = self.write('unknown.ndjson', self.post_rows(2, 'newcomer'))
+        self.assertIn('пропущено: 2', self.import_data('posts', path))
+        self.import_data('posts', path, '--create-missing')
+        self.assertEqual(
+            Post.objects.filter(author__username='newcomer').count(), 2)
+
+    def test_resume_from_checkpoint(self):
+        path = self.write('resume.ndjson', self.post_rows(6))
+        original = Importer.import_batch
+        batches = []
+
+        def failing_batch(importer, rows):
+            if len(batches) == 1:
+                raise RuntimeError('Сбой')
+            batches.append(rows)
+            return original(importer, rows)
+
+        with mock.patch.object(Importer, 'import_batch', failing_batch):
+            with self.assertRaises(RuntimeError):
+                self.import_data('posts', path, '--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 2)
+        out = self.import_data('posts', path, '--batch-size', '2')
+        self.assertIn('Продолжение после строки 2', out)
+        self.assertIn('Загружено: 4', out)
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(ImportRun.objects.get().rows, 0)
+
+    def test_crash_after_commit_does_not_duplicate(self):
+        """
+        Сбой сразу после коммита пачки: соответствие id и контрольная
+        точка записаны с ней, продолжение не загружает её повторно.
+        """
+        path = self.write('crash.ndjson', self.post_rows(6))
+        original = Importer.import_batch
+        committed = []
+
+        def crash_after_commit(importer, rows):
+            count = original(importer, rows)
+            committed.append(rows)
+            if len(committed) == 2:
+                raise RuntimeError('Сбой')
+            return count
+
+        with mock.patch.object(Importer, 'import_batch', crash_after_commit):
+            with self.assertRaises(RuntimeError):
+                self.import_data('posts', path, '--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 4)
+        out = self.import_data('posts', path, '--batch-size', '2')
+        self.assertIn('Продолжение после строки 4', out)
+        self.assertIn('Загружено: 2', out)
+        self.assertEqual(Post.objects.count(), 6)
+        with open(f'{path}.ids', encoding='utf-8') as file:
+            self.assertEqual(len(file.readlines()), 6)
+
+    def test_csv_export_round_trip(self):
+        path = self.write('source.ndjson', self.post_rows(3))
+        self.import_data('posts', path)
+        exported = os.path.join(EXPORT_DIR, 'posts.csv')
+        call_command('export_data', 'posts', '--format', 'csv',
+                     '--output', exported, stderr=StringIO())
+        expected = list(Post.objects.order_by('pk').values_list(
+            'pk', 'pub_date', 'text', 'group_id'))
+        Post.objects.all().delete()
+        self.import_data('posts', exported, '--format', 'csv')
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'pk', 'pub_date', 'text', 'group_id')), expected)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDatasetTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, *args):
+        call_command('generate_dataset', '--posts', '600', '--users', '60',
+                     '--seed', '3', *args, stdout=StringIO())
+
+    def snapshot(self):
+        """Посты без зависящих от базы id и текущего времени."""
+        first_user = User.objects.order_by('pk').first().pk
+        first_group = Group.objects.order_by('pk').first().pk
+        return [
+            (author_id - first_user,
+             group_id - first_group if group_id else None, text, image)
+            for author_id, group_id, text, image in Post.objects.order_by(
+                'pk').values_list('author_id', 'group_id', 'text', 'image')
+        ]
+
+    def test_same_seed_gives_same_dataset(self):
+        self.generate()
+        first = self.snapshot()
+        follows = Follow.objects.count()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(Follow.objects.count(), follows)
+
+    def test_dataset_is_skewed(self):
+        self.generate()
+        self.assertEqual(Post.objects.count(), 600)
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertFalse(Follow.objects.filter(
+            user_id=models.F('author_id')).exists())
+        for field in ('posts_count', 'followers_count'):
+            with self.subTest(field=field):
+                counts = sorted(UserStats.objects.values_list(
+                    field, flat=True), reverse=True)
+                self.assertEqual(len(counts), 60)
+                self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            600)
+
+    def test_refuses_non_empty_database(self):
+        author = User.objects.create_user(username=AUTHOR_USERNAME)
+        Post.objects.create(author=author, text=POST_TEXT)
+        with self.assertRaises(CommandError):
+            self.generate()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchRoutesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('generate_dataset', '--posts', '200', '--users', '20',
+                     stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_every_route_is_measured(self):
+        """Все маршруты замерены для обеих ролей и не меняют данные."""
+        follows = Follow.objects.count()
+        comments = Comment.objects.count()
+        os.makedirs(TEMP_MEDIA_ROOT, exist_ok=True)
+        path = os.path.join(TEMP_MEDIA_ROOT, 'bench.json')
+        call_command('bench_routes', '--repeat', '1', '--output', path,
+                     stdout=StringIO())
+        with open(path, encoding='utf-8') as file:
+            report = json.load(file)
+        self.assertEqual(report['meta']['counts']['post'], 200)
+        measured = {(row['route'], row['role']) for row in report['results']}
+        self.assertEqual(measured, {
+            (name, role) for name, _ in routes() for role in ROLES})
+        for row in report['results']:
+            with self.subTest(route=row['route'], role=row['role']):
+                self.assertLess(row['status'], 500)
+                self.assertGreater(row['peak_kb'], 0)
+        out = StringIO()
+        call_command('bench_routes', '--repeat', '1', '--compare', path,
+                     stdout=out)
+        self.assertIn('Сравнение', out.getvalue())
+        self.assertEqual(Follow.objects.count(), follows)
+        self.assertEqual(Comment.objects.count(), comments)
@@ -1,4 +1,8 @@
+import io
+import os
 import shutil
+import subprocess
+import sys
 import tempfile
 from http import HTTPStatus
 
@@ -6,6 +10,7 @@ from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import CommentForm, PostForm
 from posts.models import Comment, Group, Post, User
@@ -165,3 +170,122 @@ class TaskCreateFormTests(TestCase):
             + TaskCreateFormTests.POST_EDIT_URL
         )
         self.assertRedirects(response, redirect_url)
+
+
+# Дочерний процесс: создаёт JPEG на 48 Мпикс. с EXIF Orientation.
+MAKE_BIG_JPEG = '''
+import sys
+from PIL import Image
+exif = Image.Exif()
+exif[0x0112] = 6
+Image.new('RGB', (8000, 6000), 'teal').save(
+    sys.argv[1], quality=90, exif=exif.tobytes())
+'''
+# Снимок экрана 4K с прозрачностью: PNG декодируется целиком.
+MAKE_BIG_PNG = '''
+import sys
+from PIL import Image
+Image.new('RGBA', (3840, 2160), 'teal').save(sys.argv[1])
+'''
+# Дочерний процесс: обрабатывает картинку и печатает прирост пикового
+# потребления памяти в КБ и размер результата.
+NORMALIZE_IMAGE = '''
+import resource, sys
+from PIL import Image, JpegImagePlugin
+from posts.images import normalize_image
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+with open(sys.argv[1], 'rb') as source:
+    result = normalize_image(source, int(sys.argv[2]))
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+with Image.open(result) as image:
+    print(peak - before, *image.size)
+'''
+# Полное декодирование такой картинки — больше 140 МБ.
+UPLOAD_PEAK_MEMORY_KB = 128 * 1024
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=AUTHOR_USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ImageUploadPipelineTest.user)
+
+    @staticmethod
+    def jpeg(size, **save_options):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'teal').save(buffer, 'JPEG', **save_options)
+        return SimpleUploadedFile(
+            'photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=200)
+    def test_image_downsampled_rotated_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        self.authorized_client.post(POST_CREATE_URL, data={
+            'text': POST_TEXT,
+            'image': self.jpeg((400, 300), exif=exif.tobytes()),
+        })
+        post = Post.objects.get(text=POST_TEXT)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (150, 200))
+            self.assertEqual(dict(image.getexif()), {})
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_oversized_image_rejected(self):
+        form = PostForm(
+            data={'text': POST_TEXT},
+            files={'image': self.jpeg((20, 20))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_peak_memory_bounded(self):
+        """
+        Пиковая память на обработку ограничена: для JPEG в 48 Мпикс.
+        и для PNG, который декодируется целиком.
+        """
+        max_side = settings.POST_IMAGE_MAX_SIDE
+        cases = (
+            ('big.jpg', MAKE_BIG_JPEG, (max_side * 3 // 4, max_side)),
+            ('big.png', MAKE_BIG_PNG, (max_side, max_side * 9 // 16)),
+        )
+        for name, make, size in cases:
+            with self.subTest(name=name), \
+                    tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, name)
+                subprocess.run([sys.executable, '-c', make, path], check=True)
+                output = subprocess.run(
+                    [sys.executable, '-c', NORMALIZE_IMAGE, path,
+                     str(max_side)],
+                    check=True, capture_output=True, text=True,
+                    cwd=settings.BASE_DIR,
+                    env={**os.environ,
+                         'DJANGO_SETTINGS_MODULE': 'yatube.settings'},
+                ).stdout
+                peak, width, height = map(int, output.split())
+                self.assertEqual((width, height), size)
+                self.assertLess(peak, UPLOAD_PEAK_MEMORY_KB)
+
+    @override_settings(POST_IMAGE_MAX_DECODED_PIXELS=100)
+    def test_png_limited_by_decoded_size(self):
+        """PNG отклоняется по меньшему пределу, JPEG того же размера — нет."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 20), 'teal').save(buffer, 'PNG')
+        png = SimpleUploadedFile(
+            'screen.png', buffer.getvalue(), content_type='image/png')
+        for image, valid in ((png, False), (self.jpeg((20, 20)), True)):
+            with self.subTest(image=image.name):
+                form = PostForm(
+                    data={'text': POST_TEXT}, files={'image': image})
+                self.assertEqual(form.is_valid(), valid)
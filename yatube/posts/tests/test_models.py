@@ -1,6 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from ..models import Comment, Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserStats
 
 AUTHOR_USERNAME = 'HasNoName'
 USER_USERNAME = 'TestUser'
@@ -54,3 +58,86 @@ class PostModelTest(TestCase):
         for model, expected_value in field_str.items():
             with self.subTest(model=model):
                 self.assertEqual(expected_value, str(field_model[model]))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.user = User.objects.create_user(username=USER_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев следуют за созданием и удалением."""
+        post = Post.objects.create(
+            author=CountersTest.author, text=POST_TEXT,
+            group=CountersTest.group
+        )
+        Comment.objects.create(
+            post=post, author=CountersTest.user, text=COMMENT_TEXT)
+        self.assertCounters(CountersTest.author.stats, posts_count=1)
+        self.assertCounters(CountersTest.group, posts_count=1)
+        self.assertCounters(post, comments_count=1)
+        post.group = None
+        post.save()
+        self.assertCounters(CountersTest.group, posts_count=0)
+        post.delete()
+        self.assertCounters(CountersTest.author.stats, posts_count=0)
+
+    def test_author_change_moves_post_count(self):
+        """Смена автора поста (в админке) переносит счётчик постов."""
+        post = Post.objects.create(author=CountersTest.author, text=POST_TEXT)
+        post.author = CountersTest.user
+        post.save()
+        self.assertCounters(CountersTest.author.stats, posts_count=0)
+        self.assertCounters(CountersTest.user.stats, posts_count=1)
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertCounters(CountersTest.user.stats, posts_count=1)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        follow = Follow.objects.create(
+            user=CountersTest.user, author=CountersTest.author)
+        self.assertCounters(CountersTest.author.stats, followers_count=1)
+        self.assertCounters(CountersTest.user.stats, following_count=1)
+        follow.delete()
+        self.assertCounters(CountersTest.author.stats, followers_count=0)
+        self.assertCounters(CountersTest.user.stats, following_count=0)
+
+    def test_follow_constraints(self):
+        """База не даёт подписаться дважды или на самого себя."""
+        Follow.objects.create(
+            user=CountersTest.user, author=CountersTest.author)
+        for user, author in (
+            (CountersTest.user, CountersTest.author),
+            (CountersTest.user, CountersTest.user),
+        ):
+            with self.subTest(user=user, author=author):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    Follow.objects.create(user=user, author=author)
+
+    def test_recount_counters_repairs_drift(self):
+        """Команда recount_counters исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create([
+            Post(author=CountersTest.author, text=POST_TEXT,
+                 group=CountersTest.group)
+            for _ in range(3)
+        ])
+        UserStats.objects.filter(user=CountersTest.user).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(CountersTest.author.stats, posts_count=3)
+        self.assertCounters(CountersTest.group, posts_count=3)
+        self.assertTrue(
+            UserStats.objects.filter(user=CountersTest.user).exists())
@@ -0,0 +1,316 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+AUTHOR_USERNAME = 'HasNoName'
+USER_USERNAME = 'TestUser'
+GROUP_SLUG = 'test-slug'
+POST_TEXT = 'Тестовый пост'
+AUTHORS_COUNT = 20
+SCALES = (10, 1_000, 100_000)
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Число запросов на каждой странице постов не зависит от объёма данных.
+    Бюджеты включают запросы сессии и пользователя.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username=USER_USERNAME)
+        cls.authors = [
+            User.objects.create_user(username=f'{AUTHOR_USERNAME}_{i}')
+            for i in range(AUTHORS_COUNT)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'{GROUP_SLUG}-{i}', description='-'
+            ) for i in range(2)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=cls.reader, author=author)
+            for author in cls.authors[::2]
+        )
+        cls.post = Post.objects.create(author=cls.reader, text=POST_TEXT)
+        cls.author_post = Post.objects.create(
+            author=cls.authors[0], text=POST_TEXT)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=author, text=POST_TEXT)
+            for author in cls.authors
+        )
+        author = cls.authors[0].username
+        cls.budgets = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', args=[cls.groups[0].slug]): 5,
+            reverse('posts:profile', args=[author]): 6,
+            reverse('posts:post_detail', args=[cls.post.pk]): 4,
+            reverse('posts:post_detail', args=[cls.author_post.pk]): 4,
+            reverse('posts:post_comments', args=[cls.post.pk]): 1,
+            reverse('posts:follow_index'): 4,
+            reverse('posts:post_create'): 3,
+            reverse('posts:post_edit', args=[cls.post.pk]): 5,
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(QueryBudgetTest.reader)
+
+    def grow(self, total):
+        authors, groups = QueryBudgetTest.authors, QueryBudgetTest.groups
+        start = Post.objects.count()
+        Post.objects.bulk_create(
+            Post(
+                text=f'{POST_TEXT} {i}',
+                author=authors[i % len(authors)],
+                group=groups[i % 3] if i % 3 < len(groups) else None,
+            ) for i in range(start, total)
+        )
+        call_command('recount_counters', stdout=StringIO())
+
+    def test_posts_urls_stay_within_query_budget(self):
+        """Страницы укладываются в бюджет запросов на любом объёме."""
+        for scale in SCALES:
+            self.grow(scale)
+            for url, budget in QueryBudgetTest.budgets.items():
+                with self.subTest(scale=scale, url=url):
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertLessEqual(
+                        len(queries), budget,
+                        '\n'.join(query['sql'] for query in queries)
+                    )
+
+    def test_post_lists_do_not_count_posts(self):
+        """Число постов в списках берётся из счётчиков, а не из COUNT."""
+        self.grow(SCALES[0])
+        author = QueryBudgetTest.authors[0].username
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[QueryBudgetTest.groups[0].slug]),
+            reverse('posts:profile', args=[author]),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                self.assertEqual([
+                    query['sql'] for query in queries
+                    if 'COUNT(' in query['sql']
+                    and 'FROM "posts_post"' in query['sql']
+                ], [])
+
+
+class QueryPlanTest(TestCase):
+    """
+    Списки постов и комментариев читаются по индексу в нужном порядке:
+    без полного просмотра таблицы и без сортировки во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username=USER_USERNAME)
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = Group.objects.create(
+            title='Группа', slug=GROUP_SLUG, description='-')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text=POST_TEXT)
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text=POST_TEXT)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.reader)
+        cache.clear()
+
+    def list_query_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        plans = []
+        for query in queries:
+            sql = query['sql']
+            if 'ORDER BY' not in sql or '"password"' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append([row[-1] for row in cursor.fetchall()])
+        self.assertTrue(plans, f'Не найден запрос списка для {url}')
+        return plans
+
+    def assertIndexedPlan(self, url, allow_sort=False):
+        for plan in self.list_query_plans(url):
+            for step in plan:
+                with self.subTest(url=url, step=step):
+                    if step.startswith('SCAN'):
+                        self.assertIn('USING', step)
+                    if not allow_sort:
+                        self.assertNotIn('TEMP B-TREE', step)
+
+    def test_list_views_use_indexes(self):
+        """Лента, группа, профиль и комментарии идут по индексам."""
+        post_id = QueryPlanTest.post.pk
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[GROUP_SLUG]),
+            reverse('posts:profile', args=[AUTHOR_USERNAME]),
+            reverse('posts:post_comments', args=[post_id]),
+        ):
+            self.assertIndexedPlan(url)
+
+    def test_follow_index_uses_indexes(self):
+        """
+        Лента подписок собирается по индексам; сортировать приходится
+        только посты выбранных авторов. Материализованная лента читается
+        из индекса уже в нужном порядке.
+        """
+        self.assertIndexedPlan(reverse('posts:follow_index'), allow_sort=True)
+        with self.settings(FOLLOW_FEED_MATERIALIZED=True,
+                           BACKGROUND_TASKS_SYNC=True):
+            call_command('backfill_timeline', stdout=StringIO())
+            self.assertIndexedPlan(reverse('posts:follow_index'))
+
+
+class AdminChangeListTest(TestCase):
+    """
+    Списки админки не делают запросов на каждую строку, не считают
+    всю таблицу и ищут по имени пользователя через индексы.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.authors = [
+            User.objects.create_user(username=f'{AUTHOR_USERNAME}_{i}')
+            for i in range(AUTHORS_COUNT)
+        ]
+        cls.group = Group.objects.create(
+            title='Группа', slug=GROUP_SLUG, description='-')
+        cls.changelists = [
+            reverse(f'admin:posts_{model}_changelist')
+            for model in ('post', 'group', 'comment', 'follow')
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(AdminChangeListTest.admin)
+
+    def grow(self, total):
+        authors = AdminChangeListTest.authors
+        start = Post.objects.count()
+        Post.objects.bulk_create(
+            Post(text=f'{POST_TEXT} {i}', author=authors[i % len(authors)],
+                 group=AdminChangeListTest.group)
+            for i in range(start, total)
+        )
+        Comment.objects.bulk_create(
+            Comment(post_id=post_id, author_id=author_id, text=POST_TEXT)
+            for post_id, author_id in Post.objects.filter(
+                comments=None).values_list('pk', 'author_id')
+        )
+        Follow.objects.bulk_create(
+            Follow(user=authors[i], author=authors[i + 1])
+            for i in range(Follow.objects.count(),
+                           min(total, len(authors) - 1))
+        )
+
+    def changelist_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.grow(3)
+        counts = {
+            url: len(self.changelist_queries(url)[1])
+            for url in AdminChangeListTest.changelists
+        }
+        self.grow(AUTHORS_COUNT * 3)
+        for url in AdminChangeListTest.changelists:
+            with self.subTest(url=url):
+                _, queries = self.changelist_queries(url)
+                self.assertEqual(len(queries), counts[url], queries)
+
+    def test_group_editable_in_post_list(self):
+        """Группу поста можно сменить прямо в списке постов."""
+        self.grow(3)
+        other = Group.objects.create(
+            title='Другая группа', slug='other', description='-')
+        url = reverse('admin:posts_post_changelist')
+        response, _ = self.changelist_queries(url)
+        self.assertContains(
+            response, f'<option value="{AdminChangeListTest.group.pk}" '
+                      f'selected>{AdminChangeListTest.group}</option>')
+        posts = list(response.context['cl'].result_list)
+        data = {
+            'form-TOTAL_FORMS': len(posts),
+            'form-INITIAL_FORMS': len(posts),
+            '_save': 'Сохранить',
+        }
+        for number, post in enumerate(posts):
+            data[f'form-{number}-id'] = post.pk
+            data[f'form-{number}-group'] = other.pk if number == 0 else ''
+        self.client.post(url, data)
+        self.assertEqual(
+            Post.objects.filter(group=other).get().pk, posts[0].pk)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_large_tables_not_counted(self):
+        """Без фильтров число строк оценивается, с поиском — считается."""
+        self.grow(AUTHORS_COUNT)
+        url = reverse('admin:posts_post_changelist')
+        response, queries = self.changelist_queries(url)
+        self.assertFalse(
+            [sql for sql in queries if 'COUNT(*)' in sql], queries)
+        self.assertEqual(
+            response.context['cl'].result_count, Post.objects.count())
+        response, _ = self.changelist_queries(url, q=f'{POST_TEXT} 1')
+        self.assertEqual(response.context['cl'].result_count,
+                         Post.objects.filter(text__contains=' 1').count())
+
+    def test_search_by_username(self):
+        self.grow(AUTHORS_COUNT * 3)
+        author = AdminChangeListTest.authors[1]
+        for model, field in (
+            (Post, 'author'), (Comment, 'author'), (Follow, 'author'),
+        ):
+            url = reverse(f'admin:posts_{model._meta.model_name}_changelist')
+            with self.subTest(url=url):
+                response, queries = self.changelist_queries(
+                    url, q=f'@{author.username}')
+                self.assertFalse(
+                    [sql for sql in queries if 'LIKE' in sql], queries)
+                self.assertEqual(
+                    set(response.context['cl'].result_list),
+                    set(model.objects.filter(
+                        Q(**{field: author}) | Q(user=author)
+                        if model is Follow else Q(**{field: author})))
+                )
+
+    def test_plain_search_not_limited_to_username(self):
+        """Без @ имя пользователя ищется в тексте, как обычный запрос."""
+        self.grow(AUTHORS_COUNT)
+        author = AdminChangeListTest.authors[1]
+        post = Post.objects.create(
+            author=AdminChangeListTest.admin, text=f'Про {author.username}')
+        url = reverse('admin:posts_post_changelist')
+        response, _ = self.changelist_queries(url, q=author.username)
+        self.assertEqual(list(response.context['cl'].result_list), [post])
+        response, _ = self.changelist_queries(url, q='@nobody')
+        self.assertEqual(list(response.context['cl'].result_list), [])
@@ -75,3 +75,10 @@ class TaskURLTests(TestCase):
             with self.subTest(address=address):
                 response = self.guest_client.get(address)
                 self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_edit_redirects_not_author(self):
+        """Не автора со страницы правки перенаправляет на пост."""
+        reader = User.objects.create_user(username=USER_USERNAME)
+        self.authorized_client.force_login(reader)
+        response = self.authorized_client.get(TaskURLTests.POST_EDIT_URL)
+        self.assertRedirects(response, TaskURLTests.POST_DETAIL_URL)
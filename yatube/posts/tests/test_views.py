@@ -1,12 +1,34 @@
+import base64
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
 from django import forms
+from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
 
-from posts.models import Follow, Group, Post, User
+from posts.caching import get_generation
+from posts.cards import card_key, render_post_cards
+from posts.lookups import groups, users
+from posts.models import (Comment, FeedEntry, Follow, Group, Post, User,
+                          UserStats)
+from posts.search import search_posts
+from posts.thumbnails import generate_thumbnails, ready_thumbnail_url
 
 POSTS_PER_PAGE = 10
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 AUTHOR_USERNAME = 'HasNoName'
@@ -17,6 +39,8 @@ GROUP_TITLE = 'Тестовая группа'
 GROUP_SLUG = 'test-slug'
 GROUP_DESCRIPTION = 'Тестовое описание'
 POST_TEXT = 'Тестовый пост'
+GROUP_SLUG_COLUMN = '"posts_group"."slug"'
+USERNAME_COLUMN = '"auth_user"."username"'
 
 INDEX_URL = reverse('posts:index')
 GROUP_LIST_URL = reverse('posts:group_list', args=[GROUP_SLUG])
@@ -28,6 +52,7 @@ PROFILE_FOLLOW = reverse('posts:profile_follow', kwargs={
     'username': AUTHOR_USERNAME})
 PROFILE_UNFOLLOW = reverse('posts:profile_unfollow', kwargs={
     'username': AUTHOR_USERNAME})
+SEARCH_URL = reverse('posts:search')
 
 
 class PaginatorViewsTest(TestCase):
@@ -48,6 +73,7 @@ class PaginatorViewsTest(TestCase):
                 text=f'{POST_TEXT} {i}', author=cls.author, group=cls.group
             ) for i in range(cls.COUNT_OF_POSTS)
         ])
+        call_command('recount_counters', stdout=StringIO())
 
         cls.templates_pages_names = {
             INDEX_URL: 'posts/index.html',
@@ -78,6 +104,95 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']),
                                  PaginatorViewsTest.OTHERS_OF_POSTS)
 
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и предыдущую страницы."""
+        for reverse_name in (PaginatorViewsTest.
+                             templates_pages_names.keys()):
+            with self.subTest(reverse_name=reverse_name):
+                first_page = self.guest_client.get(
+                    reverse_name).context['page_obj']
+                next_cursor = first_page.next_cursor
+                self.assertContains(
+                    self.guest_client.get(reverse_name),
+                    f'?cursor={next_cursor}'
+                )
+                second_page = self.guest_client.get(
+                    reverse_name, {'cursor': str(next_cursor)}
+                ).context['page_obj']
+                self.assertEqual(len(second_page),
+                                 PaginatorViewsTest.OTHERS_OF_POSTS)
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    list(second_page),
+                    list(self.guest_client.get(
+                        reverse_name, {'page': 2}).context['page_obj'])
+                )
+                previous_page = self.guest_client.get(
+                    reverse_name, {'cursor': str(second_page.previous_cursor)}
+                ).context['page_obj']
+                self.assertEqual(list(previous_page), list(first_page))
+                self.assertFalse(previous_page.has_previous())
+
+    def test_cached_pages_differ(self):
+        """Разные страницы списка кэшируются под разными ключами."""
+        for reverse_name in (PaginatorViewsTest.
+                             templates_pages_names.keys()):
+            with self.subTest(reverse_name=reverse_name):
+                first_page = self.guest_client.get(reverse_name)
+                second_page = self.guest_client.get(
+                    reverse_name, {'page': 2})
+                self.assertNotEqual(first_page.content, second_page.content)
+                self.assertContains(second_page, f'{POST_TEXT} 0<')
+
+    def test_paginator_reads_counters(self):
+        """
+        Число постов в группе и у автора берётся из счётчиков в базе,
+        даже если группа уже лежит в кэше процесса: счётчик мог изменить
+        другой процесс.
+        """
+        self.guest_client.get(GROUP_LIST_URL)
+        # update() обходит сигналы, как изменение из другого процесса.
+        Group.objects.filter(pk=PaginatorViewsTest.group.pk).update(
+            posts_count=42)
+        UserStats.objects.filter(user=PaginatorViewsTest.author).update(
+            posts_count=42)
+        cache.clear()
+        for reverse_name in (GROUP_LIST_URL, PROFILE_URL):
+            with self.subTest(reverse_name=reverse_name):
+                response = self.guest_client.get(reverse_name)
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count, 42)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор возвращает первую страницу."""
+        response = self.guest_client.get(INDEX_URL, {'cursor': 'broken'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_cursor_with_bad_fields_falls_back_to_first_page(self):
+        """Курсор в верном base64 с негодными полями не даёт ошибку 500."""
+        post = Post.objects.latest('pk')
+        urls = (
+            INDEX_URL,
+            reverse('posts:api_index'),
+            reverse('posts:post_comments', args=[post.pk]),
+            reverse('posts:api_post_comments', args=[post.pk]),
+        )
+        for fields in (
+            ['n', '2020-01-01T00:00:00+00:00', None],
+            ['n', '2020-01-01T00:00:00+00:00', [1]],
+            ['n', '2020-01-01T00:00:00+00:00', '1'],
+            ['n', '2020-01-01T00:00:00+00:00', True],
+            ['n', '2020-01-01T00:00:00+00:00', 10 ** 30],
+            ['n', 5, 1],
+            ['x', '2020-01-01T00:00:00+00:00', 1],
+        ):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(fields).encode()).decode()
+            for url in urls:
+                with self.subTest(fields=fields, url=url):
+                    response = self.guest_client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
 
 class TaskPagesTests(TestCase):
     @classmethod
@@ -197,6 +312,8 @@ class TaskPagesTests(TestCase):
         self.assertEqual(response.context['post'].image,
                          Post.objects.all()[0].image)
         self.assertIn('small', response.context['post'].image.name)
+        self.assertEqual(response.context['author_posts_count'], 1)
+        self.assertNotIn('page_obj', response.context)
 
     def test_post_create_show_correct_context(self):
         """Шаблон post_create сформирован с правильным контекстом."""
@@ -228,36 +345,30 @@ class TaskPagesTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_index_cache_context(self):
-        """Тестирование кэша главной страницы работает исправно."""
-        tasks_count = Post.objects.count()
-        responses = {
-            'guest_client': self.guest_client.get(INDEX_URL),
-            'authorized_client': self.authorized_client.get(INDEX_URL),
-        }
-        form_data = {
-            'text': POST_TEXT,
-            'author': TaskPagesTests.user,
-        }
-        self.authorized_client.post(
-            POST_CREATE_URL,
-            data=form_data,
-            follow=True,
-        )
-
+        """Кэш главной страницы сбрасывается при изменении постов."""
         clients = {
             'guest_client': self.guest_client,
             'authorized_client': self.authorized_client,
         }
+        responses = {
+            user: client.get(INDEX_URL) for user, client in clients.items()
+        }
+        Post.objects.update(text='Изменено в обход сигналов')
         for user, client in clients.items():
             with self.subTest(user=user):
                 response = client.get(INDEX_URL)
                 self.assertEqual(responses[user].content, response.content)
-                self.assertEqual(Post.objects.count(), tasks_count + 1)
-        cache.clear()
+        new_text = 'Новый пост сразу на главной'
+        self.authorized_client.post(
+            POST_CREATE_URL,
+            data={'text': new_text},
+            follow=True,
+        )
         for user, client in clients.items():
             with self.subTest(user=user):
                 response = client.get(INDEX_URL)
                 self.assertNotEqual(responses[user].content, response.content)
+                self.assertContains(response, new_text)
 
     def test_profile_follow_and_unfollow_context(self):
         """Авторизованный пользователь может подписываться на других
@@ -296,3 +407,948 @@ class TaskPagesTests(TestCase):
         response_unfollow = authorized_client_user_2_follower.get(
             FOLLOW_INDEX)
         self.assertNotEqual(response_follow.content, response_unfollow.content)
+
+
+class FollowIndexCostTest(TestCase):
+    """Стоимость ленты подписок не зависит от числа авторов."""
+    POSTS_PER_AUTHOR = 12
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username=USER_USERNAME)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(FollowIndexCostTest.reader)
+        cache.clear()
+
+    def follow_authors(self, count):
+        for i in range(Follow.objects.count(), count):
+            author = User.objects.create_user(username=f'author_{i}')
+            Post.objects.bulk_create([
+                Post(text=f'{POST_TEXT} {i} {j}', author=author)
+                for j in range(self.POSTS_PER_AUTHOR)
+            ])
+            Follow.objects.create(
+                user=FollowIndexCostTest.reader, author=author
+            )
+        call_command('recount_counters', stdout=StringIO())
+
+    def measure(self):
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(FOLLOW_INDEX)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+        return len(queries), peak
+
+    def test_follow_index_cost_is_flat(self):
+        """Число запросов и память не растут вместе с подписками."""
+        self.follow_authors(2)
+        self.measure()
+        small_queries, small_peak = self.measure()
+        self.follow_authors(60)
+        large_queries, large_peak = self.measure()
+        self.assertEqual(small_queries, large_queries)
+        self.assertLess(large_peak, small_peak * 2)
+
+    def test_follow_index_sorted_by_pub_date(self):
+        """Лента подписок отсортирована по дате для всех авторов."""
+        self.follow_authors(3)
+        response = self.client.get(FOLLOW_INDEX)
+        dates = [post.pub_date for post in response.context['page_obj']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+
+@override_settings(FOLLOW_FEED_MATERIALIZED=True, BACKGROUND_TASKS_SYNC=True)
+class MaterializedFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.reader = User.objects.create_user(username=USER_USERNAME)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(MaterializedFeedTest.reader)
+        cache.clear()
+
+    def feed(self):
+        response = self.client.get(FOLLOW_INDEX)
+        return [post.text for post in response.context['page_obj']]
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(
+            user=MaterializedFeedTest.reader,
+            author=MaterializedFeedTest.author
+        )
+        Post.objects.create(author=MaterializedFeedTest.author, text=POST_TEXT)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=MaterializedFeedTest.reader).count(),
+            1
+        )
+        self.assertEqual(self.feed(), [POST_TEXT])
+
+    def test_follow_and_unfollow_sync_timeline(self):
+        """Подписка добавляет посты автора в ленту, отписка убирает."""
+        Post.objects.create(author=MaterializedFeedTest.author, text=POST_TEXT)
+        self.client.get(PROFILE_FOLLOW)
+        self.assertEqual(self.feed(), [POST_TEXT])
+        self.client.get(PROFILE_UNFOLLOW)
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_queued_tasks_respect_unfollow(self):
+        """
+        Задачи, выполненные уже после отписки, не возвращают посты
+        автора в ленту.
+        """
+        reader = MaterializedFeedTest.reader
+        author = MaterializedFeedTest.author
+        Post.objects.create(author=author, text=POST_TEXT)
+        with mock.patch('posts.signals.run_in_background') as queued:
+            follow = Follow.objects.create(user=reader, author=author)
+            Post.objects.create(author=author, text='Новый пост')
+            follow.delete()
+        self.assertEqual(queued.call_count, 2)
+        for call in queued.call_args_list:
+            with self.subTest(task=call.args[0].__name__):
+                call.args[0](*call.args[1:])
+                self.assertFalse(FeedEntry.objects.exists())
+
+    def test_backfill_timeline_command(self):
+        """Команда backfill_timeline строит ленты по существующим данным."""
+        with self.settings(FOLLOW_FEED_MATERIALIZED=False):
+            Follow.objects.create(
+                user=MaterializedFeedTest.reader,
+                author=MaterializedFeedTest.author
+            )
+            Post.objects.create(
+                author=MaterializedFeedTest.author, text=POST_TEXT)
+        self.assertFalse(FeedEntry.objects.exists())
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertEqual(self.feed(), [POST_TEXT])
+
+
+@override_settings(COMMENTS_TO_OUTPUT=3)
+class CommentsPaginationTest(TestCase):
+    COUNT_OF_COMMENTS = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.post = Post.objects.create(author=cls.author, text=POST_TEXT)
+        for i in range(cls.COUNT_OF_COMMENTS):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}')
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=[cls.post.pk])
+        cls.POST_COMMENTS_URL = reverse(
+            'posts:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_post_detail_shows_first_batch(self):
+        """На странице поста выводится первая порция комментариев."""
+        response = self.guest_client.get(
+            CommentsPaginationTest.POST_DETAIL_URL)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 4', 'Комментарий 3', 'Комментарий 2']
+        )
+        self.assertContains(
+            response,
+            f'{CommentsPaginationTest.POST_COMMENTS_URL}'
+            f'?cursor={comments.next_cursor}'
+        )
+
+    def test_comments_fragment_returns_next_batch(self):
+        """Фрагмент комментариев отдаёт следующую порцию без страницы."""
+        first = self.guest_client.get(
+            CommentsPaginationTest.POST_DETAIL_URL).context['comments']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                CommentsPaginationTest.POST_COMMENTS_URL,
+                {'cursor': str(first.next_cursor)}
+            )
+        self.assertTemplateUsed(response, 'posts/includes/comments_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 1', 'Комментарий 0']
+        )
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_missing_post_not_found(self):
+        """Комментарии несуществующего поста — 404, пустого — 200."""
+        empty = Post.objects.create(
+            author=CommentsPaginationTest.author, text=POST_TEXT)
+        for name in ('posts:post_comments', 'posts:api_post_comments'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.guest_client.get(
+                        reverse(name, args=[0])).status_code,
+                    HTTPStatus.NOT_FOUND)
+                self.assertEqual(
+                    self.guest_client.get(
+                        reverse(name, args=[empty.pk])).status_code,
+                    HTTPStatus.OK)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text=POST_TEXT, group=cls.group)
+        cls.urls = (
+            INDEX_URL,
+            GROUP_LIST_URL,
+            PROFILE_URL,
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_repeat_request_served_from_cache(self):
+        """Повторный запрос анонима обходится без базы и шаблонов."""
+        for url in AnonymousPageCacheTest.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertIsNone(second.context)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['ETag'], second['ETag'])
+                self.assertIn('Last-Modified', second)
+
+    def test_conditional_get_returns_not_modified(self):
+        """If-None-Match и If-Modified-Since дают 304."""
+        for url in AnonymousPageCacheTest.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                for header, value in (
+                    ('HTTP_IF_NONE_MATCH', response['ETag']),
+                    ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified']),
+                ):
+                    self.assertEqual(
+                        self.guest_client.get(url, **{header: value})
+                        .status_code,
+                        HTTPStatus.NOT_MODIFIED
+                    )
+
+    def test_new_content_invalidates_pages(self):
+        """
+        Новый пост или комментарий сбрасывает кэш страниц; ETag меняется
+        только у страниц, содержимое которых изменилось.
+        """
+        etags = {
+            url: self.guest_client.get(url)['ETag']
+            for url in AnonymousPageCacheTest.urls
+        }
+        Comment.objects.create(
+            post=AnonymousPageCacheTest.post,
+            author=AnonymousPageCacheTest.author,
+            text='Новый комментарий'
+        )
+        Post.objects.create(
+            author=AnonymousPageCacheTest.author,
+            text='Новый пост',
+            group=AnonymousPageCacheTest.group
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_edit_of_older_post_changes_last_modified(self):
+        """
+        Правка не самого нового поста меняет Last-Modified списков,
+        и If-Modified-Since не отдаёт устаревшую страницу.
+        """
+        Post.objects.create(
+            author=AnonymousPageCacheTest.author,
+            text='Новый пост',
+            group=AnonymousPageCacheTest.group
+        )
+        urls = (INDEX_URL, GROUP_LIST_URL, PROFILE_URL,
+                reverse('posts:api_index'), reverse('posts:index_rss'))
+        modified = {
+            url: self.guest_client.get(url)['Last-Modified'] for url in urls
+        }
+        post = AnonymousPageCacheTest.post
+        post.text = 'Исправленный пост'
+        # Last-Modified хранится с точностью до секунды.
+        with mock.patch('time.time', return_value=time.time() + 5):
+            post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified[url])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Исправленный пост')
+
+    def test_post_detail_last_modified_follows_related_changes(self):
+        """
+        Удаление комментария и новый пост автора меняют Last-Modified
+        страницы поста: на ней видны комментарии и число постов автора.
+        """
+        post = AnonymousPageCacheTest.post
+        comment = Comment.objects.create(
+            post=post, author=AnonymousPageCacheTest.author, text='Лишний')
+        urls = (reverse('posts:post_detail', args=[post.pk]),
+                reverse('posts:api_post_detail', args=[post.pk]))
+        for shift, change in enumerate((
+            comment.delete,
+            lambda: Post.objects.create(
+                author=AnonymousPageCacheTest.author, text='Ещё пост'),
+        ), start=1):
+            modified = {
+                url: self.guest_client.get(url)['Last-Modified']
+                for url in urls
+            }
+            # Last-Modified хранится с точностью до секунды.
+            with mock.patch('time.time',
+                            return_value=time.time() + 5 * shift):
+                change()
+            for url in urls:
+                with self.subTest(change=change, url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=modified[url])
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_authorized_pages_not_cached(self):
+        """Авторизованным пользователям страницы строятся заново."""
+        client = Client()
+        client.force_login(AnonymousPageCacheTest.author)
+        client.get(INDEX_URL)
+        self.assertIsNotNone(client.get(INDEX_URL).context)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text=POST_TEXT, group=cls.group)
+        cls.other_post = Post.objects.create(
+            author=cls.author, text='Другой пост', group=cls.group)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(PostCardCacheTest.author)
+        cache.clear()
+
+    @staticmethod
+    def card_key(post):
+        post.refresh_from_db()
+        return card_key(post)
+
+    def test_card_shared_between_lists(self):
+        """Карточка, отрисованная в одном списке, берётся из кэша в другом."""
+        self.author_client.get(INDEX_URL)
+        self.assertIsNotNone(cache.get(self.card_key(PostCardCacheTest.post)))
+        Post.objects.filter(pk=PostCardCacheTest.post.pk).update(
+            text='Изменено в обход модели')
+        for url in (GROUP_LIST_URL, PROFILE_URL):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertContains(response, POST_TEXT)
+                self.assertNotContains(response, 'Изменено в обход модели')
+
+    def test_edit_invalidates_only_its_card(self):
+        """Правка поста меняет ключ только его карточки."""
+        post = PostCardCacheTest.post
+        other_key = self.card_key(PostCardCacheTest.other_post)
+        self.author_client.get(INDEX_URL)
+        self.author_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={'text': 'Отредактированный пост', 'group': post.group.pk},
+        )
+        self.assertContains(
+            self.author_client.get(GROUP_LIST_URL), 'Отредактированный пост')
+        self.assertIsNotNone(cache.get(other_key))
+        self.assertEqual(
+            self.card_key(PostCardCacheTest.other_post), other_key)
+
+    def test_group_rename_updates_cards(self):
+        """Новый адрес группы сразу появляется в карточках."""
+        self.author_client.get(INDEX_URL)
+        group = PostCardCacheTest.group
+        group.slug = 'new-slug'
+        group.save()
+        response = self.author_client.get(INDEX_URL)
+        self.assertContains(
+            response, reverse('posts:group_list', args=['new-slug']))
+        self.assertNotContains(response, GROUP_LIST_URL)
+
+    def test_author_rename_updates_cards(self):
+        """Новое имя и адрес профиля автора видны и в кэше анонимов."""
+        guest_client = Client()
+        guest_client.get(INDEX_URL)
+        self.author_client.get(INDEX_URL)
+        author = PostCardCacheTest.author
+        author.username = 'renamed'
+        author.first_name = 'Новое'
+        author.save()
+        for client in (guest_client, self.author_client):
+            response = client.get(INDEX_URL)
+            self.assertContains(
+                response, reverse('posts:profile', args=['renamed']))
+            self.assertContains(response, 'Новое')
+            self.assertNotContains(response, PROFILE_URL)
+
+
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username=AUTHOR_USERNAME, first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'<b>{POST_TEXT} {i}</b>',
+                group=cls.group if i % 2 else None)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_cards_show_post_fields(self):
+        response = self.guest_client.get(INDEX_URL)
+        for post in PostCardsTest.posts:
+            with self.subTest(post=post.pk):
+                self.assertContains(
+                    response, f'&lt;b&gt;{post.text[3:-4]}&lt;/b&gt;')
+                self.assertContains(
+                    response, reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, 'Имя Фамилия', count=3)
+        self.assertContains(response, PROFILE_URL, count=3)
+        self.assertContains(response, GROUP_LIST_URL, count=1)
+        self.assertContains(response, '<article>', count=3)
+
+    def test_cards_read_and_written_in_one_batch(self):
+        """Страница карточек — один get_many, после промаха — один set_many."""
+        posts = Post.objects.select_related('author', 'group')
+        with mock.patch.object(cache, 'get', side_effect=AssertionError), \
+                mock.patch.object(cache, 'set', side_effect=AssertionError), \
+                mock.patch.object(cache, 'get_many',
+                                  wraps=cache.get_many) as get_many, \
+                mock.patch.object(cache, 'set_many',
+                                  wraps=cache.set_many) as set_many:
+            first = render_post_cards(posts)
+            with self.assertNumQueries(0):
+                second = render_post_cards(list(posts))
+        self.assertEqual(first, second)
+        self.assertEqual(get_many.call_count, 2)
+        self.assertEqual(set_many.call_count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(ThumbnailPregenerationTest.author)
+        cache.clear()
+
+    def uploaded(self, name):
+        return SimpleUploadedFile(
+            name=name,
+            content=ThumbnailPregenerationTest.small_gif,
+            content_type='image/gif'
+        )
+
+    @override_settings(BACKGROUND_TASKS_SYNC=True)
+    def test_post_create_generates_thumbnails(self):
+        self.author_client.post(POST_CREATE_URL, data={
+            'text': POST_TEXT, 'image': self.uploaded('create.gif')})
+        post = Post.objects.get(text=POST_TEXT)
+        url = ready_thumbnail_url(post.image, 'card')
+        self.assertIsNotNone(url)
+        response = self.author_client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, url)
+
+    def test_original_shown_until_thumbnail_ready(self):
+        """
+        Пока миниатюры нет, страницы показывают оригинал и не кэшируют
+        карточку; готовая миниатюра сбрасывает кэши списков.
+        """
+        post = Post.objects.create(
+            author=ThumbnailPregenerationTest.author, text=POST_TEXT,
+            image=self.uploaded('pending.gif'))
+        key = card_key(post)
+        self.assertContains(self.author_client.get(INDEX_URL), post.image.url)
+        self.assertIsNone(ready_thumbnail_url(post.image, 'card'))
+        self.assertIsNone(cache.get(key))
+        generate_thumbnails(post.pk)
+        url = ready_thumbnail_url(post.image, 'card')
+        self.assertContains(self.author_client.get(INDEX_URL), url)
+        self.assertIsNotNone(cache.get(key))
+
+    def test_unshown_post_keeps_listing_caches(self):
+        """Миниатюры картинки, которую никто не видел, не сбрасывают кэши."""
+        post = Post.objects.create(
+            author=ThumbnailPregenerationTest.author, text=POST_TEXT,
+            image=self.uploaded('unshown.gif'))
+        generation = get_generation()
+        generate_thumbnails(post.pk)
+        self.assertIsNotNone(ready_thumbnail_url(post.image, 'card'))
+        self.assertEqual(get_generation(), generation)
+
+    @override_settings(BACKGROUND_TASKS_SYNC=True)
+    def test_broken_image_not_reprocessed(self):
+        """Неудача запоминается: просмотры не запускают обработку снова."""
+        post = Post.objects.create(
+            author=ThumbnailPregenerationTest.author, text=POST_TEXT,
+            image=SimpleUploadedFile('broken.gif', b'GIF89a broken',
+                                     content_type='image/gif'))
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        wraps=get_thumbnail) as thumbnail, \
+                self.assertLogs('sorl.thumbnail', 'ERROR'):
+            self.author_client.get(INDEX_URL)
+            calls = thumbnail.call_count
+            cache.delete(f'thumbnails:queued:{post.image.name}')
+            response = self.author_client.get(INDEX_URL)
+        self.assertGreater(calls, 0)
+        self.assertEqual(thumbnail.call_count, calls)
+        self.assertContains(response, post.image.url)
+
+    def test_page_thumbnails_looked_up_in_one_batch(self):
+        """Миниатюры всей страницы проверяются одним запросом к kvstore."""
+        posts = [
+            Post.objects.create(
+                author=ThumbnailPregenerationTest.author, text=POST_TEXT,
+                image=self.uploaded(f'batch{i}.gif'))
+            for i in range(3)
+        ]
+        for post in posts[:2]:
+            generate_thumbnails(post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.author_client.get(INDEX_URL)
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in posts[:2]:
+            self.assertContains(
+                response, ready_thumbnail_url(post.image, 'card'))
+        self.assertContains(response, posts[2].image.url)
+
+    def test_ready_image_has_responsive_variants(self):
+        """Готовая картинка выводится с WebP и JPEG вариантами в srcset."""
+        post = Post.objects.create(
+            author=ThumbnailPregenerationTest.author, text=POST_TEXT,
+            image=self.uploaded('variants.gif'))
+        generate_thumbnails(post.pk)
+        webp = ready_thumbnail_url(post.image, 'card:480:WEBP')
+        self.assertTrue(webp.endswith('.webp'))
+        for url in (INDEX_URL, reverse('posts:post_detail', args=[post.pk])):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertContains(response, '<source type="image/webp"')
+                self.assertContains(response, f'{webp} 480w')
+                self.assertContains(response, ' 1440w', count=2)
+                self.assertContains(
+                    response, f'sizes="{settings.POST_IMAGE_SIZES}"', count=2)
+
+    def test_variant_widths_come_from_settings(self):
+        post = Post.objects.create(
+            author=ThumbnailPregenerationTest.author, text=POST_TEXT,
+            image=self.uploaded('widths.gif'))
+        with self.settings(POST_IMAGE_WIDTHS=(320,),
+                           POST_IMAGE_FORMATS=('JPEG',)):
+            generate_thumbnails(post.pk)
+            response = self.author_client.get(INDEX_URL)
+        self.assertContains(response, ' 320w', count=1)
+        self.assertNotContains(response, '<source')
+        self.assertNotContains(response, ' 480w')
+
+
+class LookupCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(LookupCacheTest.author)
+        groups.clear()
+        users.clear()
+
+    def lookup_queries(self, url, column):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.author_client.get(url)
+        return response, [
+            query for query in queries if f'WHERE {column}' in query['sql']
+        ]
+
+    def test_repeated_lookups_skip_database(self):
+        """Группа и автор второй раз берутся из памяти, без запроса."""
+        for url, column in (
+            (GROUP_LIST_URL, GROUP_SLUG_COLUMN),
+            (PROFILE_URL, USERNAME_COLUMN),
+        ):
+            with self.subTest(url=url):
+                _, queries = self.lookup_queries(url, column)
+                self.assertEqual(len(queries), 1)
+                response, queries = self.lookup_queries(url, column)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(queries, [])
+
+    def test_unknown_keys_cached_negatively(self):
+        for url, column in (
+            (reverse('posts:group_list', args=['unknown']), GROUP_SLUG_COLUMN),
+            (reverse('posts:profile', args=['unknown']), USERNAME_COLUMN),
+        ):
+            with self.subTest(url=url):
+                self.lookup_queries(url, column)
+                response, queries = self.lookup_queries(url, column)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertEqual(queries, [])
+
+    def test_changes_invalidate_entries(self):
+        """Правка группы и регистрация пользователя видны сразу."""
+        self.author_client.get(GROUP_LIST_URL)
+        group = LookupCacheTest.group
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(
+            self.author_client.get(GROUP_LIST_URL), 'Новое название')
+        url = reverse('posts:profile', args=['newcomer'])
+        self.assertEqual(
+            self.author_client.get(url).status_code, HTTPStatus.NOT_FOUND)
+        User.objects.create_user(username='newcomer')
+        self.assertEqual(
+            self.author_client.get(url).status_code, HTTPStatus.OK)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.rare = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Кот спит, а собака лает на прохожих у забора')
+        cls.often = Post.objects.create(
+            author=cls.author, text='Кот, кот и ещё раз кот')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Про погоду')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def found(self, query, page=None):
+        params = {'q': query}
+        if page:
+            params['page'] = page
+        response = self.client.get(SEARCH_URL, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return list(response.context['page_obj'])
+
+    def test_results_ranked(self):
+        """Найдены только подходящие посты, более релевантные — выше."""
+        self.assertEqual(
+            self.found('КОТ'), [SearchTest.often, SearchTest.rare])
+        self.assertEqual(self.found('кот забора'), [SearchTest.rare])
+        self.assertEqual(self.found('слон'), [])
+
+    def test_user_input_is_not_fts_syntax(self):
+        for query in ('"кот', 'кот OR погоду', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                self.found(query)
+
+    def test_index_follows_changes(self):
+        post = SearchTest.other
+        post.text = 'Теперь про слона'
+        post.save()
+        self.assertEqual(self.found('слона'), [post])
+        self.assertEqual(self.found('погоду'), [])
+        post.delete()
+        self.assertEqual(self.found('слона'), [])
+
+    def test_page_loaded_in_two_queries(self):
+        """Поиск по индексу и посты с авторами и группами."""
+        with CaptureQueriesContext(connection) as queries:
+            posts = search_posts('кот', None)
+            for post in posts:
+                post.author.username, post.group
+        self.assertEqual(len(queries), 2)
+
+    def test_paginated(self):
+        Post.objects.bulk_create(
+            Post(author=SearchTest.author, text=f'кот номер {number}')
+            for number in range(POSTS_PER_PAGE)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.found('кот')), POSTS_PER_PAGE)
+        self.assertEqual(len(self.found('кот', page=2)), 2)
+
+    def test_count_marked_when_capped(self):
+        """Число найденных у предела результатов показано как нижняя оценка."""
+        response = self.client.get(SEARCH_URL, {'q': 'кот'})
+        self.assertContains(response, 'Найдено записей:\n    2<')
+        with self.settings(SEARCH_MAX_RESULTS=2):
+            response = self.client.get(SEARCH_URL, {'q': 'кот'})
+        self.assertContains(response, 'Найдено записей:\n    не менее 2<')
+
+    @override_settings(SEARCH_MAX_CANDIDATES=1)
+    def test_only_newest_candidates_ranked(self):
+        self.assertEqual(self.found('кот'), [SearchTest.often])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_fts')
+        self.assertEqual(self.found('кот'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(
+            self.found('кот'), [SearchTest.often, SearchTest.rare])
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username=AUTHOR_USERNAME, first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username=USER_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        for number in range(POSTS_PER_PAGE + 2):
+            Post.objects.create(
+                author=cls.author, group=cls.group,
+                text=f'{POST_TEXT} {number}')
+        cls.post = Post.objects.latest('pk')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTest.reader)
+        cache.clear()
+
+    def test_feeds_paginated_by_cursor(self):
+        for client, url in (
+            (self.guest_client, reverse('posts:api_index')),
+            (self.guest_client,
+             reverse('posts:api_group_list', args=[GROUP_SLUG])),
+            (self.guest_client,
+             reverse('posts:api_profile', args=[AUTHOR_USERNAME])),
+            (self.reader_client, reverse('posts:api_follow_index')),
+        ):
+            with self.subTest(url=url):
+                first = client.get(url).json()
+                self.assertEqual(len(first['results']), POSTS_PER_PAGE)
+                self.assertIsNone(first['previous'])
+                second = client.get(url, {'cursor': first['next']}).json()
+                self.assertEqual(len(second['results']), 2)
+                self.assertIsNone(second['next'])
+                ids = [post['id'] for post in
+                       first['results'] + second['results']]
+                self.assertEqual(ids, list(Post.objects.values_list(
+                    'pk', flat=True).order_by('-pub_date', '-pk')))
+
+    def test_post_fields(self):
+        post = self.guest_client.get(
+            reverse('posts:api_index')).json()['results'][0]
+        self.assertEqual(post['id'], ApiTest.post.pk)
+        self.assertEqual(post['text'], ApiTest.post.text)
+        self.assertEqual(post['author'], {
+            'username': AUTHOR_USERNAME, 'full_name': 'Лев Толстой'})
+        self.assertEqual(post['group'], {
+            'slug': GROUP_SLUG, 'title': GROUP_TITLE})
+        self.assertEqual(post['comments_count'], 1)
+        self.assertIsNone(post['image'])
+
+    def test_post_detail_with_comments(self):
+        data = self.guest_client.get(
+            reverse('posts:api_post_detail', args=[ApiTest.post.pk])).json()
+        self.assertEqual(data['post']['id'], ApiTest.post.pk)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий'])
+        self.assertEqual(
+            self.guest_client.get(reverse(
+                'posts:api_post_detail', args=[0])).status_code,
+            HTTPStatus.NOT_FOUND)
+
+    def test_list_is_one_query(self):
+        """Посты с авторами и группами читаются одним запросом values()."""
+        url = reverse('posts:api_profile', args=[AUTHOR_USERNAME])
+        users.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        posts_queries = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(posts_queries), 1)
+
+    def test_etag_revalidation(self):
+        for client in (self.guest_client, self.reader_client):
+            with self.subTest(authenticated=client is self.reader_client):
+                url = reverse('posts:api_index')
+                response = client.get(url)
+                etag = response['ETag']
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+                post = Post.objects.create(
+                    author=ApiTest.author, text='Новый пост')
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotEqual(response['ETag'], etag)
+                post.delete()
+
+    def test_follow_index_requires_login(self):
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.other = User.objects.create_user(username=USER_OTHER_USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост в группе')
+        cls.other_post = Post.objects.create(
+            author=cls.other, text='Пост без группы')
+        cls.feeds = {}
+        for kind in ('rss', 'atom'):
+            cls.feeds.update({
+                reverse(f'posts:index_{kind}'): (
+                    kind, [cls.post, cls.other_post]),
+                reverse(f'posts:group_{kind}', args=[GROUP_SLUG]): (
+                    kind, [cls.post]),
+                reverse(f'posts:profile_{kind}', args=[USER_OTHER_USERNAME]): (
+                    kind, [cls.other_post]),
+            })
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_feeds_list_their_posts(self):
+        for url, (kind, posts) in FeedsTest.feeds.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn(kind, response['Content-Type'])
+                for post in (FeedsTest.post, FeedsTest.other_post):
+                    link = reverse('posts:post_detail', args=[post.pk])
+                    if post in posts:
+                        self.assertContains(response, link)
+                    else:
+                        self.assertNotContains(response, link)
+
+    def test_unchanged_feed_served_without_database(self):
+        for url in FeedsTest.feeds:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Last-Modified', response)
+                with self.assertNumQueries(0):
+                    self.guest_client.get(url)
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_edit_changes_feed(self):
+        url = reverse('posts:group_atom', args=[GROUP_SLUG])
+        etag = self.guest_client.get(url)['ETag']
+        post = FeedsTest.post
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_unknown_group_and_author(self):
+        for url in (
+            reverse('posts:group_rss', args=['unknown']),
+            reverse('posts:profile_atom', args=['unknown']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.guest_client.get(url).status_code,
+                    HTTPStatus.NOT_FOUND)
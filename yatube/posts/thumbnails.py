@@ -0,0 +1,235 @@
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .caching import bump_generation
+from .models import Post
+from .tasks import run_in_background
+
+# Пока задача в очереди, повторно её не ставим.
+QUEUE_LOCK_TIMEOUT = 60
+QUEUED_KEY = 'thumbnails:queued:{}'
+# Картинка показана оригиналом: страница с ним могла попасть в кэш.
+SHOWN_KEY = 'thumbnails:shown:{}'
+# Миниатюры создать не удалось, повторная попытка откладывается.
+FAILED_KEY = 'thumbnails:failed:{}'
+
+# Картинка поста для <picture>: адрес для src, srcset по форматам
+# ((формат, srcset), ...) и признак того, что все миниатюры готовы.
+Picture = namedtuple('Picture', 'src srcsets ready')
+
+# Память найденных миниатюр на время запроса (см. start_request_memo).
+_memo = threading.local()
+
+
+def start_request_memo():
+    _memo.urls = {}
+
+
+def end_request_memo():
+    _memo.urls = None
+
+
+def thumbnail_spec(name):
+    """
+    Геометрия и опции sorl.thumbnail миниатюры name: ключа
+    settings.POST_THUMBNAILS или его варианта вида 'card:480:WEBP'.
+    Вариант сохраняет пропорции миниатюры при другой ширине.
+    """
+    base, _, variant = name.partition(':')
+    geometry, options = settings.POST_THUMBNAILS[base]
+    if not variant:
+        return geometry, options
+    width, image_format = variant.split(':')
+    base_width, base_height = map(int, geometry.split('x'))
+    height = round(int(width) * base_height / base_width)
+    return f'{width}x{height}', {**options, 'format': image_format}
+
+
+def variant_names(name):
+    return [
+        f'{name}:{width}:{image_format}'
+        for image_format in settings.POST_IMAGE_FORMATS
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def thumbnail_names():
+    """Все миниатюры, которые создаются для картинки поста."""
+    return [
+        thumbnail
+        for name in settings.POST_THUMBNAILS
+        for thumbnail in (name, *variant_names(name))
+    ]
+
+
+def thumbnail_file(image, name):
+    """
+    Файл миниатюры name для картинки. Имя вычисляется так же,
+    как в sorl.thumbnail get_thumbnail, но сама миниатюра не создаётся.
+    """
+    geometry, options = thumbnail_spec(name)
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, geometry, options),
+        default.storage
+    )
+
+
+def _lookup(files):
+    """
+    Ключи тех файлов миниатюр, что уже есть в хранилище sorl.thumbnail.
+    Для хранилища по умолчанию (кэш + таблица) это один get_many к кэшу
+    и, если в кэше не всё, один запрос к таблице.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {file.key for file in files if kvstore.get(file)}
+    keys = {add_prefix(file.key): file.key for file in files}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # Как и sorl: отсутствие тоже кэшируется, чтобы не ходить в базу.
+        empty = cached_db_kvstore.EMPTY_VALUE
+        fetched = {key: stored.get(key, empty) for key in missing}
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    return {
+        keys[key] for key, value in found.items()
+        if value != cached_db_kvstore.EMPTY_VALUE
+    }
+
+
+def ready_thumbnail_urls(images, names):
+    """
+    Адреса уже созданных миниатюр names для картинок:
+    {(image.name, name): url}. Все миниатюры проверяются одним пакетом;
+    в пределах запроса результаты запоминаются.
+    """
+    memo = getattr(_memo, 'urls', None)
+    urls, files = {}, {}
+    for image in images:
+        for name in names:
+            key = image.name, name
+            if memo is not None and key in memo:
+                urls[key] = memo[key]
+            else:
+                files[key] = thumbnail_file(image, name)
+    if files:
+        ready = _lookup(files.values())
+        for key, file in files.items():
+            urls[key] = file.url if file.key in ready else None
+            if memo is not None:
+                memo[key] = urls[key]
+    return {key: url for key, url in urls.items() if url}
+
+
+def ready_thumbnail_url(image, name):
+    """Адрес миниатюры, если она уже создана, иначе None."""
+    return ready_thumbnail_urls([image], [name]).get((image.name, name))
+
+
+def post_pictures(posts, name):
+    """
+    Картинки постов для <picture>: {pk: Picture}. Миниатюра name и все
+    её варианты проверяются одним пакетом для всех постов. Пока готово
+    не всё, отдаётся оригинал без srcset, а создание миниатюр ставится
+    в очередь, если прошлая попытка не закончилась неудачей.
+    """
+    posts = [post for post in posts if post.image]
+    names = [name, *variant_names(name)]
+    urls = ready_thumbnail_urls([post.image for post in posts], names)
+    pictures, pending = {}, []
+    for post in posts:
+        found = {
+            thumbnail: urls.get((post.image.name, thumbnail))
+            for thumbnail in names
+        }
+        if not all(found.values()):
+            pending.append(post)
+            pictures[post.pk] = Picture(post.image.url, (), False)
+            continue
+        srcsets = tuple(
+            (image_format, ', '.join(
+                f'{found[f"{name}:{width}:{image_format}"]} {width}w'
+                for width in settings.POST_IMAGE_WIDTHS
+            ))
+            for image_format in settings.POST_IMAGE_FORMATS
+        )
+        pictures[post.pk] = Picture(found[name], srcsets, True)
+    if pending:
+        _queue_pending(pending)
+    return pictures
+
+
+def _queue_pending(posts):
+    """
+    Отмечает картинки постов как показанные оригиналом и ставит в очередь
+    создание их миниатюр, кроме тех, что недавно не удалось создать.
+    """
+    names = {post.pk: post.image.name for post in posts}
+    failed = cache.get_many(
+        [FAILED_KEY.format(name) for name in names.values()])
+    cache.set_many(
+        {SHOWN_KEY.format(name): True for name in names.values()},
+        max(settings.LISTING_CACHE_TIMEOUT, settings.PAGE_CACHE_TIMEOUT))
+    for post in posts:
+        if FAILED_KEY.format(names[post.pk]) not in failed:
+            queue_thumbnails(post)
+
+
+def queue_thumbnails(post):
+    """Ставит в фоновую очередь создание всех миниатюр картинки поста."""
+    if post.image and cache.add(
+        QUEUED_KEY.format(post.image.name), True, QUEUE_LOCK_TIMEOUT
+    ):
+        run_in_background(generate_thumbnails, post.pk)
+
+
+def generate_thumbnails(post_id):
+    """
+    Создаёт миниатюры из settings.POST_THUMBNAILS и их варианты всех
+    ширин и форматов. Если картинка уже показывалась оригиналом,
+    сбрасывает кэши списков, в которые он мог попасть. Если создать
+    удалось не всё, отмечает неудачу, чтобы не повторять её на каждом
+    просмотре.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    names = thumbnail_names()
+    try:
+        for name in names:
+            geometry, options = thumbnail_spec(name)
+            get_thumbnail(post.image, geometry, **options)
+    finally:
+        image = post.image.name
+        files = [thumbnail_file(post.image, name) for name in names]
+        if _lookup(files) != {file.key for file in files}:
+            cache.set(FAILED_KEY.format(image), True,
+                      settings.POST_THUMBNAILS_RETRY_TIMEOUT)
+        elif cache.get(SHOWN_KEY.format(image)):
+            cache.delete(SHOWN_KEY.format(image))
+            bump_generation()
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.db.models import F
+
+from .models import FeedEntry, Follow, Post
+from .utils import chunks
+
+
+def _bulk_add(entries, recheck):
+    """
+    Пишет записи лент пачками. Задача могла ждать в очереди, пока
+    пользователь отписался: отписка удаляет записи сразу и не видит
+    тех, что ещё не записаны. Поэтому после каждой пачки recheck(chunk)
+    сверяет её с подписками и удаляет лишнее; False — остановиться.
+    """
+    size = settings.FEED_FANOUT_CHUNK_SIZE
+    for chunk in chunks(entries, size):
+        FeedEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+        if not recheck(chunk):
+            return
+
+
+def fan_out_post(post_id):
+    """Раскладывает пост в ленты всех подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'pub_date').first()
+    if post is None:
+        return
+    author_id = post['author_id']
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('user_id', flat=True)
+
+    def recheck(chunk):
+        user_ids = {entry.user_id for entry in chunk}
+        gone = user_ids - set(Follow.objects.filter(
+            author_id=author_id, user_id__in=user_ids
+        ).values_list('user_id', flat=True))
+        if gone:
+            FeedEntry.objects.filter(
+                post_id=post_id, user_id__in=gone).delete()
+        return True
+
+    _bulk_add((
+        FeedEntry(user_id=user_id, post_id=post_id,
+                  pub_date=post['pub_date'])
+        for user_id in follower_ids.iterator()
+    ), recheck)
+
+
+def add_author_to_timeline(user_id, author_id):
+    """
+    Добавляет в ленту пользователя все посты автора, пока подписка
+    на него существует.
+    """
+    def recheck(chunk):
+        if Follow.objects.filter(
+                user_id=user_id, author_id=author_id).exists():
+            return True
+        remove_author_from_timeline(user_id, author_id)
+        return False
+
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('pk', 'pub_date')
+    _bulk_add((
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    ), recheck)
+
+
+def remove_author_from_timeline(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def timeline_posts(user):
+    """
+    Посты из материализованной ленты пользователя. Ключ сортировки
+    feed_date и id поста feed_post берутся из индекса ленты, а не из
+    таблицы постов: сортировка (feed_date, feed_post) читается из
+    индекса без временного B-дерева.
+    """
+    return Post.objects.filter(
+        feed_entries__user=user
+    ).annotate(
+        feed_date=F('feed_entries__pub_date'),
+        feed_post=F('feed_entries__post'),
+    ).select_related('author', 'group')
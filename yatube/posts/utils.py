@@ -1,9 +1,225 @@
+import base64
+import json
+from collections.abc import Sequence
+from itertools import islice
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property, lazy
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+# pk из курсора должен помещаться в 64-битное целое столбца id.
+CURSOR_PK_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def chunks(iterable, size):
+    """Списки по size элементов из iterable."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def field_value(obj, name):
+    """Поле объекта модели или строки values()."""
+    if isinstance(obj, dict):
+        return obj[name]
+    return getattr(obj, name)
+
+
+def encode_cursor(direction, obj, key):
+    """
+    Непрозрачный токен курсора на позицию объекта (key, pk). Объект —
+    экземпляр модели или строка values() с полями key и 'pk'.
+    """
+    value = field_value(obj, key).isoformat()
+    raw = json.dumps([direction, value, field_value(obj, 'pk')]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, value, pk = json.loads(raw.decode())
+        value = parse_datetime(value)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Некорректный курсор')
+    if (direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or value is None
+            or type(pk) is not int or pk not in CURSOR_PK_RANGE):
+        raise ValueError('Некорректный курсор')
+    return direction, value, pk
+
+
+class CountedPaginator(Paginator):
+    """Paginator, берущий общее число объектов из готового счётчика."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is not None:
+            return self._count
+        return super().count
+
+
+def estimate_count(queryset):
+    """
+    Примерное число строк таблицы без фильтров, не читая её целиком:
+    в SQLite — наибольший id, в PostgreSQL — статистика планировщика.
+    Для других баз и запросов с фильтрами — None.
+    """
+    if queryset.query.has_filters():
+        return None
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite':
+        return model._default_manager.using(queryset.db).aggregate(
+            estimate=Max('pk'))['estimate'] or 0
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для больших таблиц: без фильтров число строк, начиная
+    с ESTIMATED_COUNT_THRESHOLD, берётся из оценки, а не из COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу (key, pk) без OFFSET и COUNT(*).
+    Общее число объектов считается только при обращении к count.
+    tiebreak — поле с тем же значением, что pk, по которому удобнее
+    сортировать, например столбец индекса связанной таблицы.
+    """
+
+    def __init__(self, queryset, per_page, key, count=None, tiebreak='pk'):
+        self.queryset = queryset.order_by(f'-{key}', f'-{tiebreak}')
+        self.per_page = per_page
+        self.key = key
+        self.tiebreak = tiebreak
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is not None:
+            return self._count
+        return self.queryset.count()
+
+    def page(self, token=None):
+        """Страница после курсора token; без токена — первая страница."""
+        if token is None:
+            object_list = list(self.queryset[:self.per_page + 1])
+            has_more = len(object_list) > self.per_page
+            return CursorPage(
+                object_list[:self.per_page], self, has_more, False)
+        direction, value, pk = decode_cursor(token)
+        if direction == CURSOR_NEXT:
+            queryset = self.queryset.filter(
+                Q(**{f'{self.key}__lt': value})
+                | Q(**{self.key: value, f'{self.tiebreak}__lt': pk})
+            )
+        else:
+            queryset = self.queryset.filter(
+                Q(**{f'{self.key}__gt': value})
+                | Q(**{self.key: value, f'{self.tiebreak}__gt': pk})
+            ).order_by(self.key, self.tiebreak)
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if direction == CURSOR_NEXT:
+            return CursorPage(object_list, self, has_more, True)
+        object_list.reverse()
+        return CursorPage(object_list, self, True, has_more)
+
+
+class CursorPage(Sequence):
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+        add_cursors(self, paginator.key)
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def add_cursors(page, key):
+    """
+    Добавляет странице курсоры. Они ленивые: список объектов не
+    загружается, если шаблон взят из кэша и курсоры не понадобились.
+    """
+    page.next_cursor = page.previous_cursor = None
+    if page.has_next():
+        page.next_cursor = lazy(
+            lambda: encode_cursor(CURSOR_NEXT, page[len(page) - 1], key),
+            str
+        )()
+    if page.has_previous():
+        page.previous_cursor = lazy(
+            lambda: encode_cursor(CURSOR_PREVIOUS, page[0], key), str)()
 
 
-def paginate_queryset(request, list):
-    paginator = Paginator(list, settings.POSTS_TO_OUTPUT)
+def paginate_queryset(request, object_list, key='pub_date', count=None,
+                      tiebreak='pk'):
+    """
+    Возвращает страницу объектов. С параметром ?cursor= страница строится
+    по ключу (key, pk), иначе — обычный Paginator по ?page=N.
+    Если передан count, общее число объектов не считается запросом.
+    """
+    object_list = object_list.order_by(f'-{key}', f'-{tiebreak}')
+    token = request.GET.get('cursor')
+    if token:
+        paginator = CursorPaginator(
+            object_list, settings.POSTS_TO_OUTPUT, key, count, tiebreak)
+        try:
+            return paginator.page(token)
+        except ValueError:
+            pass
+    paginator = CountedPaginator(
+        object_list, settings.POSTS_TO_OUTPUT, count)
     page_number = request.GET.get('page')
 
-    return paginator.get_page(page_number)
+    page = paginator.get_page(page_number)
+    add_cursors(page, key)
+    return page
@@ -1,45 +1,59 @@
 # posts/views.py
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import (get_list_or_404, get_object_or_404, redirect,
-                              render)
+from django.db.models import Sum
+from django.http import Http404
+from django.shortcuts import get_object_or_404, redirect, render
 
+from .caching import cache_anonymous_page, generation_modified, listing_cache
+from .counters import get_stats, group_posts_count, total_posts
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginate_queryset
+from .lookups import groups, users
+from .models import Comment, Follow, Post, UserStats
+from .search import search_posts
+from .thumbnails import queue_thumbnails
+from .timeline import timeline_posts
+from .utils import CursorPaginator, paginate_queryset
 
 
+@cache_anonymous_page(generation_modified)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
 
-    page_obj = paginate_queryset(request, post_list)
+    page_obj = paginate_queryset(request, post_list, count=total_posts())
 
     context = {
         'title': settings.TITLE_INDEX,
         'page_obj': page_obj,
+        **listing_cache(request, 'index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_anonymous_page(generation_modified)
 def group_posts(request, slug):
 
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginate_queryset(request, post_list)
+    group = groups.get_or_404(slug)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = paginate_queryset(
+        request, post_list, count=group_posts_count(group.pk))
 
     context = {
         'group': group,
         'page_obj': page_obj,
-
+        **listing_cache(request, f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_anonymous_page(generation_modified)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = users.get_or_404(username)
+    post_list = author.posts.select_related('author', 'group')
+    stats = get_stats(author)
 
-    page_obj = paginate_queryset(request, post_list)
+    page_obj = paginate_queryset(
+        request, post_list, count=stats.posts_count)
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -50,29 +64,73 @@ def profile(request, username):
         'author': author,
         'title': settings.TITLE_INDEX,
         'page_obj': page_obj,
-        'following': following
+        'stats': stats,
+        'following': following,
+        **listing_cache(request, f'profile:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache_anonymous_page(generation_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_list = post.author.posts.all()
-
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_TO_OUTPUT,
+        'created'
+    ).page()
     commentForm = CommentForm(request.POST or None)
-    page_obj = paginate_queryset(request, post_list)
     is_edit = request.user == post.author
 
     context = {
         'post': post,
         'title': settings.TITLE_INDEX,
-        'page_obj': page_obj,
+        'author_posts_count': get_stats(post.author).posts_count,
         'is_edit': is_edit,
         'form': commentForm,
+        'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def check_post_exists(post_id, comments):
+    """
+    404, если поста нет. Непустая порция комментариев уже означает,
+    что пост есть, поэтому к постам обращаемся только при пустой.
+    """
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404(f'Пост {post_id} не найден')
+
+
+def post_comments(request, post_id):
+    """Фрагмент HTML со следующей порцией комментариев к посту."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_TO_OUTPUT,
+        'created'
+    )
+    try:
+        comments = paginator.page(request.GET.get('cursor'))
+    except ValueError:
+        comments = paginator.page()
+    check_post_exists(post_id, comments)
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': search_posts(query, request.GET.get('page')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     postForm = PostForm(request.POST or None,
@@ -86,6 +144,7 @@ def post_create(request):
         author = request.user
         result = Post(author=author, text=text, group=group, image=image)
         result.save()
+        queue_thumbnails(result)
         return redirect('posts:profile', author)
     return render(request, template, {'form': postForm})
 
@@ -94,7 +153,7 @@ def post_create(request):
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if not request.user == post.author:
-        return redirect('posts:post_detail', post.author)
+        return redirect('posts:post_detail', post_id)
 
     postForm = PostForm(request.POST or None,
                         files=request.FILES or None,
@@ -103,6 +162,8 @@ def post_edit(request, post_id):
     template = 'posts/create_post.html'
     if postForm.is_valid():
         postForm.save()
+        if 'image' in postForm.changed_data:
+            queue_thumbnails(post)
         return redirect('posts:post_detail', post_id)
 
     return render(request, template, {'form': postForm, 'is_edit': True})
@@ -125,20 +186,21 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    if Follow.objects.filter(
-            user=request.user).exists() is False:
-        context = {
-            'title': settings.TITLE_FOLLOW_INDEX,
-            'page_obj': [],
-        }
-        return render(request, 'posts/follow.html', context)
-
-    follow_list = get_list_or_404(Follow, user=request.user)
-    posts = []
-    for follow in follow_list:
-        posts += Post.objects.filter(author=follow.author)
-
-    page_obj = paginate_queryset(request, posts)
+    count = UserStats.objects.filter(
+        user__following__user=request.user
+    ).aggregate(total=Sum('posts_count'))['total'] or 0
+    if settings.FOLLOW_FEED_MATERIALIZED:
+        page_obj = paginate_queryset(
+            request, timeline_posts(request.user), key='feed_date',
+            count=count, tiebreak='feed_post')
+    else:
+        page_obj = paginate_queryset(
+            request,
+            Post.objects.filter(
+                author__following__user=request.user
+            ).select_related('author', 'group'),
+            count=count
+        )
 
     context = {
         'title': settings.TITLE_FOLLOW_INDEX,
@@ -149,7 +211,7 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     if author == request.user:
         return redirect('posts:profile', author)
     if Follow.objects.filter(
@@ -162,7 +224,7 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     follow = get_object_or_404(Follow, user=request.user, author=author)
     follow.delete()
     return redirect('posts:profile', author)
@@ -1,14 +1,84 @@
 import os
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 POSTS_TO_OUTPUT = 10
+COMMENTS_TO_OUTPUT = 20
 TITLE_INDEX = 'Последние обновления на сайте'
 TITLE_FOLLOW_INDEX = 'Посты авторов, на которых подписан текущий пользователь'
 EMPTY_VALUE = '-пусто-'
 
+# Списки постов кэшируются надолго: ключ меняется при любом изменении
+# постов, групп и комментариев (см. posts/caching.py).
+LISTING_CACHE_TIMEOUT = 60 * 60 * 6
+# Карточка поста кэшируется по (id, updated): правка поста меняет ключ
+# только его карточки.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Страницы для анонимных пользователей кэшируются целиком.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Миниатюры картинок постов: имя -> (геометрия, опции sorl.thumbnail).
+# Создаются в фоне при публикации и правке поста, до этого шаблоны
+# показывают оригинал (см. posts/thumbnails.py).
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Если миниатюры создать не удалось (битая картинка), следующая попытка —
+# не раньше чем через POST_THUMBNAILS_RETRY_TIMEOUT, до тех пор выводится
+# оригинал.
+POST_THUMBNAILS_RETRY_TIMEOUT = 60 * 60 * 24
+# Загрузки сразу пишутся во временный файл, а не в память. Картинка поста
+# больше POST_IMAGE_MAX_PIXELS отклоняется по заголовку, остальные
+# уменьшаются до POST_IMAGE_MAX_SIDE по большей стороне. Не-JPEG
+# декодируются целиком, для них предел POST_IMAGE_MAX_DECODED_PIXELS:
+# снимок экрана 4K проходит, а память на обработку остаётся ниже 128 МБ.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_PIXELS = 60_000_000
+POST_IMAGE_MAX_DECODED_PIXELS = 9_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Для каждой миниатюры создаются варианты этих ширин в этих форматах
+# и выводятся в srcset. Последний формат — запасной для <img>,
+# остальные идут в <source>.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+
+# Группы по slug и пользователи по username кэшируются в памяти процесса
+# (см. posts/lookups.py); ненайденные — на более короткий срок.
+LOOKUP_CACHE_TIMEOUT = 60
+LOOKUP_CACHE_NEGATIVE_TIMEOUT = 10
+LOOKUP_CACHE_MAX_SIZE = 10_000
+
+# RSS и Atom: последние FEED_ITEMS постов, заголовок записи — первые
+# FEED_TITLE_WORDS слов текста (см. posts/feeds.py).
+FEED_ITEMS = 20
+FEED_TITLE_WORDS = 8
+
+# Списки админки по большим таблицам без фильтров показывают примерное
+# число строк вместо COUNT(*) (см. posts/utils.py).
+ESTIMATED_COUNT_THRESHOLD = 10_000
+
+# Поиск по постам ранжирует SEARCH_MAX_CANDIDATES самых новых совпадений
+# и отдаёт не больше SEARCH_MAX_RESULTS лучших (см. posts/search.py).
+SEARCH_MAX_CANDIDATES = 10_000
+SEARCH_MAX_RESULTS = 1000
+
+# Материализованная лента подписок: посты раскладываются по лентам
+# подписчиков при публикации (см. posts/timeline.py).
+FOLLOW_FEED_MATERIALIZED = False
+FEED_FANOUT_CHUNK_SIZE = 1000
+
+# Фоновые задачи выполняются в пуле потоков после коммита транзакции.
+BACKGROUND_WORKERS = 2
+BACKGROUND_TASKS_SYNC = False
+
 SECRET_KEY = 'sk=srrw)pss-uej(3ka9cdhe3&=punk8^izhqz5e^sum#ncds('
 
 DEBUG = False
@@ -102,9 +172,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Кэш общий для всех процессов на машине: файл SQLite с вытеснением LRU.
+# Тесты очищают кэш, поэтому им достаётся свой временный файл.
+CACHE_LOCATION = os.path.join(BASE_DIR, 'cache.sqlite3')
+if sys.argv[1:2] == ['test'] or 'pytest' in sys.modules:
+    CACHE_LOCATION = os.path.join(
+        tempfile.mkdtemp(prefix='yatube-cache-'), 'cache.sqlite3')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 